@@ -0,0 +1,108 @@
+# Synthetic Yandex.Contest pages with the same structure as the real ones
+# (only the parts that yacontest reads + some page chrome around them)
+
+import json
+
+head = '''<!DOCTYPE html><html><head><meta charset="utf-8"><title>Contest</title>
+<link rel="stylesheet" href="/static/main.css"><script>var config = {"lang": "ru", "csrf": "0123456789abcdef"};</script></head>
+<body><div class="header"><a class="logo" href="/">Яндекс.Контест</a><ul class="nav"><li><a href="/contest/{cid}/problems/">Задачи</a></li>
+<li><a href="/contest/{cid}/submits/">Посылки</a></li><li><a href="/contest/{cid}/standings/">Положение участников</a></li></ul></div>
+<div class="content">'''
+tail = '''</div><div class="footer"><a href="/about/">О сервисе</a> <a href="/support/">Поддержка</a></div>
+<script src="/static/main.js"></script></body></html>'''
+
+
+def pid(i):
+    return chr(ord('A') + i % 26) + (str(i // 26) if i >= 26 else '')
+
+
+def page(cid, body):
+    return head.replace('{cid}', str(cid)) + body + tail
+
+
+def enter_page(cid, logged_in=False):
+    if logged_in:
+        return page(cid, '<a href="/contest/{}/problems/">Начать</a>'.format(cid))
+    return page(cid, '<a class="link_access_login" href="/login/?retpath=/contest/{}/">Войти</a>'.format(cid))
+
+
+def login_page():
+    return page(0, '<form method="post" action="/login/"><input type="hidden" name="retpath" value="/"/>'
+                   '<input name="login"/><input type="password" name="password"/></form>')
+
+
+def problems_page(cid, count):
+    items = ''.join('<li><a href="/contest/{}/problems/{}/">{}. Problem {}</a></li>'.format(cid, pid(i), pid(i), i)
+                    for i in range(count))
+    return page(cid, '<ul class="tabs"><li>Задачи</li></ul><ul>{}</ul>'.format(items))
+
+
+def problem_page(cid, problem, legend_size=20, attachments=False):
+    legend = ''.join('<p>Paragraph {} of the legend, with formula <img src="/testsys/tex/render/eF57aX0=.png"/> '
+                     'and <b>bold</b> text.</p>'.format(i) for i in range(legend_size))
+    if attachments:  # an image of the problem and a PDF with all statements, the same for all problems
+        legend += ('<p><img src="/contest/{cid}/files/{p}.png"/></p>'
+                   '<p><a href="/contest/{cid}/files/statements.pdf">Statements in PDF</a></p>').format(cid=cid, p=problem)
+    samples = ''.join('<table class="sample-tests"><tr><th>Ввод</th><th>Вывод</th></tr>'
+                      '<tr><td><pre>{} {}\n</pre></td><td><pre>{}\n</pre></td></tr></table>'.format(i, i + 1, 2 * i + 1)
+                      for i in range(2))
+    statement = ('<div class="problem-statement"><h1 class="title">{p}. Problem {p}</h1>'
+                 '<table><tr class="time-limit"><td>Ограничение времени</td><td>1 секунда</td></tr>'
+                 '<tr class="memory-limit"><td>Ограничение памяти</td><td>64Mb</td></tr></table>'
+                 '<div class="legend">{legend}</div><h2>Формат ввода</h2><div class="input-specification"><p>Two integers</p></div>'
+                 '<h2>Формат вывода</h2><div class="output-specification"><p>One integer</p></div>{samples}'
+                 '<h2>Примечания</h2><div class="notes"><p>Notes</p></div></div>').format(p=problem, legend=legend, samples=samples)
+    form = ('<form action="/search/"><input name="text" value=""/></form>'
+            '<form action="/contest/{cid}/submit/" method="post" enctype="multipart/form-data">'
+            '<input type="hidden" name="sk" value="token"/><input type="hidden" name="retpath" value="/contest/{cid}/problems/{p}/"/>'
+            '<select name="{p}-compilerId"><option value="gcc7_3">GNU c++17 7.3</option><option value="python3">Python 3.7.3</option>'
+            '<option value="pypy3">PyPy 3</option></select><input type="hidden" name="{p}-solution" value="file"/>'
+            '<input type="file" name="{p}-file"/></form>').format(cid=cid, p=problem)
+    return page(cid, statement + form)
+
+
+def submit_table(rows):
+    # rows: [(run id, verdict, test)]
+    html = '<table><tr><th>ID</th><th>Вердикт</th><th>Время</th><th>Память</th><th>Тест</th><th>Баллы</th></tr>'
+    for sid, verdict, test in rows:
+        html += '<tr><td>{}</td><td>{}</td><td>15ms</td><td>1.2Mb</td><td>{}</td><td>-</td></tr>'.format(sid, verdict, test)
+    return json.dumps({'result': html + '</table>'})
+
+
+def submits_page(cid, rows):
+    # rows: [(run id, problem, verdict)]
+    html = '<table class="table"><tr><th>Задача</th><th>Вердикт</th><th>Отчёт</th></tr>'
+    for sid, problem, verdict in rows:
+        html += ('<tr><td><a href="/contest/{cid}/problems/{p}/">{p}</a></td><td><a href="/contest/{cid}/run-report/{sid}/">{v}</a></td>'
+                 '<td><a href="/contest/{cid}/run-report/{sid}/">Отчёт</a></td></tr>').format(cid=cid, p=problem, v=verdict, sid=sid)
+    return page(cid, html + '</table>')
+
+
+def standings_row(rank, name, cells, score, penalty):
+    return ('<tr><td>{}</td><td>{}</td>'.format(rank, name)
+            + ''.join('<td><div>{}</div><span>{}</span></td>'.format(c, '00:42' if c.startswith('+') else '') for c in cells)
+            + '<td>{}</td><td>{}</td></tr>'.format(score, penalty))
+
+
+def standings_page(cid, page_num, pages, rows, problems):
+    # rows: [(rank, name, cells, score, penalty)]
+    html = '<table class="table"><tr><th>Место</th><th>Участник</th>'
+    html += ''.join('<th>{}</th>'.format(pid(i)) for i in range(problems)) + '<th>Баллы</th><th>Штраф</th></tr>'
+    html += ''.join(standings_row(*row) for row in rows) + '</table>'
+    html += '<div class="pager">' + ''.join('<a href="?p={0}">{0}</a>'.format(i) for i in range(1, pages + 1) if i != page_num) + '</div>'
+    return page(cid, html)
+
+
+def sample_standings(cid, page_num, pages, per_page, problems):
+    rows = []
+    for i in range((page_num - 1) * per_page, page_num * per_page):
+        cells = ['+' if (i + j) % 3 else '-{}'.format(j % 4 + 1) for j in range(problems)]
+        rows.append((i + 1, 'participant{}'.format(i), cells, sum(c == '+' for c in cells), 10 * i))
+    return standings_page(cid, page_num, pages, rows, problems)
+
+
+def run_report(tests, log_size=10):
+    html = '<table class="table"><tr><th>Тест</th><th>Вердикт</th><th>Время</th><th>Память</th></tr>'
+    html += ''.join('<tr><td>{0}</td><td>OK</td><td>{0}ms</td><td>1.00Mb</td></tr>'.format(i) for i in range(1, tests + 1))
+    html += '</table><h3>Лог компиляции</h3><pre>{}</pre>'.format('compiler output line\n' * log_size)
+    return page(0, html)
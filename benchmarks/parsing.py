@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+# Compares full-tree parsing with targeted (strainer) parsing on large pages
+# Usage: python benchmarks/parsing.py [runs]
+
+import os
+import sys
+from time import perf_counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup  # noqa: E402
+
+import pages  # noqa: E402
+from yacontest import parsing  # noqa: E402
+
+cases = [
+    # name, markup, what is parsed by the client
+    ('standings, 1000 rows x 26', pages.sample_standings(1, 1, 10, 1000, 26), ('table', None)),
+    ('submits, 500 rows', pages.submits_page(1, [(10**6 + i, 'A', 'OK') for i in range(500)]), ('tr', None)),
+    ('problem page', pages.problem_page(1, 'A', 200), ('div', 'problem-statement')),
+    ('run report, 2000 tests', pages.run_report(2000, 1000), ('pre', None)),
+]
+
+
+def backends():
+    result = ['html.parser']
+    try:
+        import lxml  # noqa: F401
+        result.append('lxml')
+    except ImportError:
+        pass
+    return result
+
+
+def best(func, runs):
+    times = []
+    for _ in range(runs):
+        start = perf_counter()
+        func()
+        times.append(perf_counter() - start)
+    return min(times)
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    print('default backend:', parsing.parser)
+    for name, markup, (tag, class_) in cases:
+        print(f'{name} ({len(markup) // 1024} KiB)')
+        for backend in backends():
+            full = best(lambda: BeautifulSoup(markup, backend), runs)
+            part = best(lambda: parsing.parse(markup, tag, class_, backend), runs)
+            print(f'    {backend:12s} full: {full * 1000:8.1f} ms  targeted: {part * 1000:8.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
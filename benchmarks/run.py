@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# End-to-end benchmarks of the client against the local stand-in server (benchmarks/server.py)
+# Usage: python benchmarks/run.py [--jobs N] [--json FILE] [server options, see --help] [scenario ...]
+# Each scenario starts with an empty config / cache, so the login flow is included
+
+import argparse
+import contextlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import tracemalloc
+from time import perf_counter
+from urllib.request import urlopen
+
+here = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, here)
+sys.path.insert(0, os.path.dirname(here))
+
+import pages  # noqa: E402
+from server import PASSWORD, add_options  # noqa: E402
+
+
+def load(client, opts):
+    client.load_problems(opts.jobs)
+
+
+def loadcode(client, opts):
+    client.load_code(jobs=opts.jobs)
+
+
+def leaderboard(client, opts):
+    client.show_leaderboard(1, all_pages=True, jobs=opts.jobs)
+
+
+def check(client, opts):
+    with open('solution.cpp', 'w') as f:
+        f.write('int main() {}\n')
+    client.submit('A', 'solution.cpp', True)
+
+
+def report(client, opts):
+    from yacontest.client import SolutionStatus
+    status = SolutionStatus(['ID', 'Вердикт'], ['1000001', 'Тестируется'])  # not checked, so it isn't cached
+    for _ in range(5):
+        client._status_details(status, tests=True)
+
+
+def statement(client, opts):
+    from yacontest.client import Statement
+    from yacontest.parsing import parse
+    html = pages.problem_page(1, 'A', 200)
+    for _ in range(20):
+        Statement(parse(html, 'div', 'problem-statement').find('div', class_='problem-statement'))
+
+
+scenarios = {
+    'load': load,
+    'loadcode': loadcode,
+    'leaderboard': leaderboard,
+    'check': check,
+    'report': report,
+    'statement': statement,
+}
+
+
+class Sandbox():
+    # empty config, cache and working directory
+    def __init__(self, address):
+        self.tmp = tempfile.TemporaryDirectory()
+        for name in ('config', 'cache', 'data', 'cwd'):
+            os.mkdir(os.path.join(self.tmp.name, name))
+        os.environ['YACONTEST_CONFIG_DIR'] = os.path.join(self.tmp.name, 'config')
+        os.environ['XDG_CACHE_HOME'] = os.path.join(self.tmp.name, 'cache')
+        os.environ['XDG_DATA_HOME'] = os.path.join(self.tmp.name, 'data')
+        from yacontest import config
+        config.set_cfg({'domain': address, 'scheme': 'http', 'login': 'benchmark', 'password': PASSWORD,
+                        'contest': 1, 'lang': 'GNU c++17 7.3'})  # no cookies
+        self.cwd = os.getcwd()
+        os.chdir(os.path.join(self.tmp.name, 'cwd'))
+
+    def close(self):
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+
+def run(func, opts, address, memory):
+    sandbox = Sandbox(address)
+    try:
+        from yacontest.client import Client
+        urlopen(f'http://{address}/_reset').read()
+        if memory:
+            tracemalloc.start()
+        start = perf_counter()
+        client = Client()
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            func(client, opts)
+        elapsed = perf_counter() - start
+        peak = None
+        if memory:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        stats = json.loads(urlopen(f'http://{address}/_stats').read())
+        stats['retries'] = client.http.metrics['retries']
+        return elapsed, stats, peak
+    finally:
+        sandbox.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline benchmarks')
+    parser.add_argument('scenarios', nargs='*', help=', '.join(scenarios))
+    parser.add_argument('--jobs', type=int, default=4)
+    parser.add_argument('--json', help='also write results to this file')
+    server_opts = add_options(parser)
+    opts = parser.parse_args()
+    server_args = [f'--{name.replace("_", "-")}={getattr(opts, name)}' for name in server_opts]
+    for name in opts.scenarios:
+        if name not in scenarios:
+            parser.error(f'unknown scenario: {name}')
+    opts.scenarios = opts.scenarios or list(scenarios)
+
+    server = subprocess.Popen([sys.executable, os.path.join(here, 'server.py')] + server_args,
+                              stdout=subprocess.PIPE, universal_newlines=True)
+    try:
+        address = server.stdout.readline().split()[-1]
+        results = {}
+        print(f'{"scenario":12s} {"wall, s":>8s} {"requests":>9s} {"retries":>8s} {"KiB":>9s} {"peak MiB":>9s}')
+        for name in opts.scenarios:
+            elapsed, stats, _ = run(scenarios[name], opts, address, False)
+            _, _, peak = run(scenarios[name], opts, address, True)  # tracemalloc slows everything down, separate run
+            results[name] = {'wall': elapsed, 'requests': stats['requests'], 'retries': stats['retries'],
+                             'bytes': stats['bytes'], 'peak_memory': peak}
+            print(f'{name:12s} {elapsed:8.3f} {stats["requests"]:9d} {stats["retries"]:8d} {stats["bytes"] / 1024:9.0f} {peak / 2**20:9.1f}')
+        if opts.json:
+            with open(opts.json, 'w') as f:
+                json.dump(results, f, indent=1)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# Local stand-in for a Yandex.Contest server, serves pages from pages.py
+# Usage: python benchmarks/server.py [--port P] [--latency MS] [...], see --help
+# GET /_stats returns {"requests": ..., "bytes": ...}, GET /_reset resets the counters
+
+import argparse
+import email
+import email.policy
+import json
+import os
+import random
+import re
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from time import sleep, time
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pages  # noqa: E402
+
+PASSWORD = 'password'
+SESSION = 'Session_id=benchmark'
+
+
+class Contest():
+    def __init__(self, opts):
+        self.opts = opts
+        self.lock = threading.Lock()
+        self.stats = {'requests': 0, 'bytes': 0}
+        self.runs = []  # dicts, oldest first
+        for i in range(opts.submits):  # already checked solutions, for loadcode
+            self.runs.append({'sid': 10**6 + i, 'cid': 1, 'problem': pages.pid(i % opts.problems),
+                              'verdict': 'OK' if i % 3 else 'WA', 'time': 0, 'code': b'int main() {}\n' * 50})
+        self.standings = {}  # rendered pages
+
+    def verdict(self, run):
+        # (verdict, test) at the current moment
+        elapsed = time() - run['time']
+        if elapsed < self.opts.judge_delay / 3:
+            return 'Ожидание проверки', '-'
+        if elapsed < self.opts.judge_delay:
+            return 'Тестируется', str(int(elapsed * 10) + 1)
+        return run['verdict'], '-' if run['verdict'] == 'OK' else '3'
+
+    def standings_page(self, cid, page):
+        opts = self.opts
+        pages_count = (opts.participants + opts.per_page - 1) // opts.per_page
+        if page > pages_count:
+            return pages.page(cid, '<p>Нет результатов</p>')
+        key = (cid, page)
+        if key not in self.standings:
+            self.standings[key] = pages.sample_standings(cid, page, pages_count, opts.per_page, opts.problems)
+        return self.standings[key]
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def reply(self, code, body=b'', ctype='text/html; charset=utf-8', headers=()):
+        contest = self.server.contest
+        if isinstance(body, str):
+            body = body.encode()
+        if contest.opts.latency:
+            sleep(contest.opts.latency / 1000)
+        self.send_response(code)
+        self.send_header('Content-Type', ctype)
+        self.send_header('Content-Length', str(len(body)))
+        for k, v in headers:
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+        with contest.lock:
+            contest.stats['bytes'] += len(body)
+
+    def redirect(self, location, headers=()):
+        self.reply(302, headers=[('Location', location)] + list(headers))
+
+    def count(self):
+        if not self.path.startswith('/_'):
+            with self.server.contest.lock:
+                self.server.contest.stats['requests'] += 1
+
+    def do_GET(self):
+        self.count()
+        contest = self.server.contest
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        path = url.path
+        if path == '/_stats':
+            return self.reply(200, json.dumps(contest.stats), 'application/json')
+        if path == '/_reset':
+            contest.stats.update(requests=0, bytes=0)
+            return self.reply(200, '{}', 'application/json')
+        if random.random() < contest.opts.fail_rate:  # an overloaded server
+            return self.reply(503, 'Service unavailable')
+        if path == '/login/':
+            return self.reply(200, pages.login_page())
+        if path == '/':
+            return self.reply(200, pages.page(0, ''))
+        m = re.match(r'/contest/(\d+)/(.*)$', path)
+        if m is None:
+            return self.reply(404, 'Not found')
+        cid, rest = int(m.group(1)), m.group(2)
+        if rest == 'enter/':
+            return self.reply(200, pages.enter_page(cid, SESSION in self.headers.get('Cookie', '')))
+        if SESSION not in self.headers.get('Cookie', ''):
+            return self.redirect(f'/contest/{cid}/enter/')
+
+        if rest == 'problems/':
+            return self.reply(200, pages.problems_page(cid, contest.opts.problems))
+        m = re.match(r'problems/(\w+)/$', rest)
+        if m:
+            problem = m.group(1)
+            if query.get('ajax') == ['submit-table']:
+                runs = [r for r in reversed(contest.runs) if r['cid'] == cid and r['problem'] == problem]
+                return self.reply(200, pages.submit_table([(r['sid'], *contest.verdict(r)) for r in runs[:20]]), 'application/json')
+            return self.reply(200, pages.problem_page(cid, problem, attachments=contest.opts.attachment_size > 0))
+        m = re.match(r'files/([\w.]+)$', rest)
+        if m and contest.opts.attachment_size > 0:
+            name = m.group(1)
+            return self.reply(200, (name.encode() * (contest.opts.attachment_size * 1024))[:contest.opts.attachment_size * 1024],
+                              'application/pdf' if name.endswith('.pdf') else 'image/png')
+        if rest == 'submits':
+            page = int(query.get('p', ['1'])[0])
+            runs = [r for r in reversed(contest.runs) if r['cid'] == cid][(page - 1) * 20:page * 20]
+            return self.reply(200, pages.submits_page(cid, [(r['sid'], r['problem'], contest.verdict(r)[0]) for r in runs]))
+        m = re.match(r'(run-report|download-source)/(\d+)/$', rest)
+        if m:
+            runs = [r for r in contest.runs if r['sid'] == int(m.group(2))]
+            if not runs:
+                return self.reply(404, 'Not found')
+            if m.group(1) == 'run-report':
+                return self.reply(200, pages.run_report(contest.opts.report_tests))
+            return self.reply(200, runs[0]['code'], 'application/octet-stream',
+                              [('Content-Disposition', f'attachment; filename="{runs[0]["sid"]}.cpp"')])
+        if rest == 'standings/':
+            return self.reply(200, contest.standings_page(cid, int(query.get('p', ['1'])[0])))
+        return self.reply(404, 'Not found')
+
+    def do_POST(self):
+        self.count()
+        contest = self.server.contest
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        path = urlparse(self.path).path
+        if path == '/login/':
+            if parse_qs(body.decode()).get('password') == [PASSWORD]:
+                return self.redirect('/', [('Set-Cookie', SESSION + '; Path=/')])
+            return self.reply(200, pages.login_page())
+        m = re.match(r'/contest/(\d+)/submit/$', path)
+        if m is None:
+            return self.reply(404, 'Not found')
+        cid = int(m.group(1))
+        if SESSION not in self.headers.get('Cookie', ''):
+            return self.redirect(f'/contest/{cid}/enter/')
+        msg = email.message_from_bytes(b'Content-Type: ' + self.headers['Content-Type'].encode() + b'\r\n\r\n' + body,
+                                       policy=email.policy.HTTP)
+        fields = {part.get_param('name', header='content-disposition'): part.get_payload(decode=True) for part in msg.iter_parts()}
+        problem = next(name.split('-')[0] for name in fields if name.endswith('compilerId'))
+        code = next(value for name, value in fields.items() if name.endswith('-file'))
+        with contest.lock:
+            sid = 2 * 10**6 + len(contest.runs)
+            verdict = 'CE' if b'#error' in code else 'WA' if b'wrong' in code else 'OK'
+            contest.runs.append({'sid': sid, 'cid': cid, 'problem': problem, 'verdict': verdict, 'time': time(), 'code': code})
+        return self.redirect(f'/contest/{cid}/problems/{problem}/?success=1')
+
+
+class Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+def add_options(parser):
+    parser.add_argument('--latency', type=float, default=0, help='delay before each response, ms')
+    parser.add_argument('--problems', type=int, default=20)
+    parser.add_argument('--participants', type=int, default=2000)
+    parser.add_argument('--per-page', type=int, default=100, help='standings rows per page')
+    parser.add_argument('--submits', type=int, default=100, help='checked solutions in contest 1')
+    parser.add_argument('--report-tests', type=int, default=100, help='tests in each run report')
+    parser.add_argument('--judge-delay', type=float, default=1.5, help='seconds until a new solution is checked')
+    parser.add_argument('--fail-rate', type=float, default=0, help='fraction of GET requests answered with 503')
+    parser.add_argument('--attachment-size', type=int, default=0, help='KiB, problems have an image and a PDF of this size')
+    return ['latency', 'problems', 'participants', 'per_page', 'submits', 'report_tests', 'judge_delay', 'fail_rate',
+            'attachment_size']
+
+
+def options(args=None):
+    parser = argparse.ArgumentParser(description='Local Yandex.Contest stand-in')
+    parser.add_argument('--port', type=int, default=0)
+    add_options(parser)
+    return parser.parse_args(args)
+
+
+def start(opts):
+    server = Server(('127.0.0.1', opts.port), Handler)
+    server.contest = Contest(opts)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    server = start(options())
+    print(f'Listening on 127.0.0.1:{server.server_address[1]}', flush=True)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# Measures startup time of the CLI and checks that local commands don't import heavy modules
+# Usage: python benchmarks/startup.py [runs]
+
+import os
+import statistics
+import subprocess
+import sys
+from time import perf_counter
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+heavy = ['requests', 'bs4', 'html2text', 'pkg_resources']
+
+snippets = {
+    'python': 'pass',
+    'import yacontest.console': 'import yacontest.console',
+    'import yacontest.client': 'import yacontest.client',
+}
+
+
+def measure(code, runs):
+    env = dict(os.environ, PYTHONPATH=root)
+    times = []
+    for _ in range(runs):
+        start = perf_counter()
+        subprocess.run([sys.executable, '-c', code], env=env, check=True)
+        times.append(perf_counter() - start)
+    return statistics.median(times)
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    base = None
+    for name, code in snippets.items():
+        t = measure(code, runs)
+        if base is None:
+            base = t
+        print(f'{name:30s} {t * 1000:7.1f} ms  (+{(t - base) * 1000:.1f} ms)')
+
+    check = 'import sys, yacontest.console; print(" ".join(m for m in {} if m in sys.modules))'.format(heavy)
+    loaded = subprocess.run([sys.executable, '-c', check], env=dict(os.environ, PYTHONPATH=root),
+                            check=True, stdout=subprocess.PIPE, universal_newlines=True).stdout.split()
+    if loaded:
+        print('ERROR: yacontest.console imports', ', '.join(loaded))
+        sys.exit(1)
+    print('yacontest.console imports none of:', ', '.join(heavy))
+
+
+if __name__ == '__main__':
+    main()
@@ -19,11 +19,11 @@ setup(
     url='https://github.com/vvd170501/yacontest',
     license='GPL',
     packages=['yacontest'],
-    package_data={'yacontest': ['data/config']},
     entry_points={
         'console_scripts': ['yacontest = yacontest.console:main'],
     },
     install_requires=['beautifulsoup4', 'requests', 'html2text'],
+    extras_require={'fast': ['lxml']},
     classifiers=[
         'Development Status :: 4 - Beta',
         'License :: OSI Approved :: GNU General Public License (GPL)',
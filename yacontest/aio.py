@@ -0,0 +1,105 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from .client import Client, Statement, StatusPoller
+from .parsing import parse
+
+
+class AsyncClient():
+    # asyncio API for scripts, returns results instead of printing them and raises YacontestError on errors
+    # requests are blocking, so they run in a thread pool, all of them share one connection pool
+    # every method takes a contest id, so operations with different contests can run concurrently
+    def __init__(self, client=None, jobs=8):
+        self.client = client if client is not None else Client(nocid=True)
+        self.client.interactive = False
+        self.client._set_pool_size(jobs)
+        self.executor = ThreadPoolExecutor(jobs)
+
+    async def _run(self, func, *args, **kwargs):
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+
+    async def close(self):
+        self.executor.shutdown(wait=False)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def problems(self, contest):
+        # {problem id: url}
+        return await self._run(self.client._get_problems, contest)
+
+    async def statement(self, contest, problem):
+        url = await self._run(self.client._get_problem_url, problem.lower(), contest)
+        r = await self._run(self.client._req_get, url)
+        def render():
+            return Statement(parse(r.text, 'div', 'problem-statement').find('div', class_='problem-statement'))
+        return await self._run(render)
+
+    async def submit(self, contest, problem, filename, compiler=None):
+        # returns an error message from the server or None if the solution was uploaded
+        problem = problem.lower()
+        if compiler is None:
+            compiler = self.client.cfg.get('lang')
+        err, _ = await self._run(self.client._send_solution, problem, filename, compiler, contest)
+        return err
+
+    async def status(self, contest, problem):
+        # SolutionStatus of the last solution
+        return await self._run(self.client._get_status, problem.lower(), contest)
+
+    async def wait(self, contest, problem, on_update=None):
+        # polls the last solution until it's checked, on_update(status) is called for intermediate statuses
+        delay = StatusPoller.min_delay
+        while True:
+            status = await self.status(contest, problem)
+            if status.checked:
+                return status
+            if on_update is not None:
+                on_update(status)
+            if status.testing:
+                delay = min(delay * StatusPoller.backoff, StatusPoller.max_delay)
+            else:
+                delay = StatusPoller.min_delay
+            await asyncio.sleep(delay)
+
+    async def details(self, contest, status):
+        # contents of the run report (e.g. compilation log)
+        return await self._run(self.client._status_details, status, contest)
+
+    async def report(self, contest, status):
+        # the parsed run report: {'tests': [{'test', 'verdict', 'time', 'memory', ...}], 'logs': [(title, text)]}
+        return await self._run(self.client._run_report, status, contest)
+
+    async def standings(self, contest, page=1):
+        # {'rows': [[cell text]], 'problems': [title], 'pages': number of pages, ...} or None if the page is empty
+        return await self._run(self.client._get_standings_page, page, None, contest)
+
+    async def submits(self, contest, page=1):
+        # [(run id, problem id, verdict, report url)], newest first, empty if there are no more pages
+        return await self._run(self.client._get_submits, contest, page)
+
+    async def source(self, report_url):
+        # (file extension, source code as bytes) of a run from submits()
+        return await self._run(self.client._fetch_source, report_url)
+
+    async def accepted_sources(self, contest):
+        # {problem id: (extension, source)} with the latest accepted solution for each problem
+        latest = {}
+        page = 1
+        while True:
+            submits = await self.submits(contest, page)
+            if not submits:
+                break
+            for sid, pid, result, report_url in submits:
+                if result == 'OK' and pid not in latest:
+                    latest[pid] = report_url
+            page += 1
+        pids = list(latest)
+        sources = await asyncio.gather(*(self.source(latest[pid]) for pid in pids))
+        return dict(zip(pids, sources))
+
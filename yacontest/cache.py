@@ -0,0 +1,104 @@
+import hashlib
+import os
+import pickle
+import re
+import threading
+from time import time
+from urllib.parse import urlencode, urlparse
+
+from .utils import write_atomic
+
+# (regex for path + query, ttl in seconds), first match wins
+# ttl 0 means that the response is always revalidated (if the server sent ETag / Last-Modified)
+# requests that don't match are not cached
+ttls = [
+    (re.compile(r'/contest/\d+/problems/$'), 600),
+    (re.compile(r'/contest/\d+/problems/[^/?]+/$'), 1800),
+]
+
+# headers which aren't stored: credentials and headers of the connection
+private_headers = {'set-cookie', 'cookie', 'authorization', 'proxy-authorization', 'www-authenticate',
+                   'connection', 'keep-alive', 'transfer-encoding', 'content-encoding', 'content-length', 'upgrade'}
+
+
+def cacheable_headers(headers):
+    return {k: v for k, v in headers.items() if k.lower() not in private_headers}
+
+
+class ResponseCache():
+    # on-disk LRU cache of GET responses, pages of a contest are private, so the cache is readable only by the user
+    def __init__(self, dirname, max_size=64 * 2**20):
+        self.dirname = dirname
+        self.max_size = max_size
+        self.size = None  # total size of entries, computed on first write
+        self.lock = threading.Lock()
+        os.makedirs(dirname, mode=0o700, exist_ok=True)
+        os.chmod(dirname, 0o700)  # created by an older version
+
+    @staticmethod
+    def ttl(url, params=None):
+        target = urlparse(url).path
+        if params:
+            target += '?' + urlencode(params)
+        for pattern, ttl in ttls:
+            if pattern.match(target):
+                return ttl
+        return None
+
+    @staticmethod
+    def key(url, params=None, user=''):
+        params = sorted((params or {}).items())
+        return hashlib.sha1(repr((user, url, params)).encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.dirname, key)
+
+    def get(self, key):
+        try:
+            with open(self._path(key), 'rb') as f:
+                entry = pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return None
+        try:
+            os.utime(self._path(key))  # mtime is used as the last access time
+        except FileNotFoundError:
+            pass
+        return entry
+
+    @staticmethod
+    def fresh(entry, ttl):
+        return ttl is not None and time() - entry['time'] < ttl
+
+    def put(self, key, entry):
+        data = pickle.dumps(entry)
+        path = self._path(key)
+        with self.lock:
+            if self.size is None:
+                self.size = sum(e.stat().st_size for e in os.scandir(self.dirname) if e.is_file())
+            try:
+                self.size -= os.path.getsize(path)
+            except FileNotFoundError:
+                pass
+            write_atomic(path, data, 0o600)
+            self.size += len(data)
+            if self.size > self.max_size:
+                self._evict()
+
+    def invalidate(self, key):
+        try:
+            os.unlink(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def _evict(self):
+        # drop least recently used entries until the cache is 3/4 full
+        entries = sorted((e for e in os.scandir(self.dirname) if e.is_file()), key=lambda e: e.stat().st_mtime)
+        for e in entries:
+            if self.size <= self.max_size * 3 // 4:
+                break
+            try:
+                size = e.stat().st_size
+                os.unlink(e.path)
+            except FileNotFoundError:
+                continue
+            self.size -= size
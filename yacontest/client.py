@@ -1,17 +1,30 @@
+import hashlib
+import json
 import os
 import re
+import shutil
 import sys
+import threading
 from base64 import b64decode
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from getpass import getpass
-from urllib.parse import urlparse, parse_qs
-from time import time, sleep
+from urllib.parse import urlparse, urljoin, parse_qs
+from time import time, sleep, strftime
 
 import requests
-from bs4 import BeautifulSoup as BS
-from html2text import HTML2Text as H2T
+from requests.structures import CaseInsensitiveDict
 
-from .config import get_cfg, set_cfg
-from .utils import clean_dir, choice
+from .cache import ResponseCache, cacheable_headers
+from .config import Store, get_cfg, settings_record
+from .download import Downloader, disposition_name
+from .history import History
+from .parsing import parse
+from .profiling import span, url_class
+from .report import ReportParser, format_logs, format_tests
+from .search import SearchIndex, section_delim
+from .transport import Session
+from .utils import YacontestError, cache_dir, clean_dir, choice, format_table, head, write_atomic
 
 
 class SolutionStatus():
@@ -46,24 +59,79 @@ class SolutionStatus():
         return msg
 
 
+tex_path = '/testsys/tex/render/'
+attachment_exts = {'.pdf', '.zip', '.gz', '.tgz', '.7z', '.rar', '.txt', '.csv', '.json', '.doc', '.docx',
+                   '.png', '.jpg', '.jpeg', '.gif', '.svg', '.h', '.hpp', '.c', '.cpp', '.py', '.java', '.in', '.out'}
+
+
+def sample_tests(html):
+    # [(input, output)] from a problem statement
+    return [tuple(cell.text for cell in test.find_all('tr')[1].find_all('td')) for test in html.find_all('table', class_='sample-tests')]
+
+
+def _parse_limit(text, units):
+    m = re.search(r'(\d+(?:[.,]\d+)?)\s*([^\d\s.,;]*)', text)
+    if m is None:
+        return None
+    value, unit = float(m.group(1).replace(',', '.')), m.group(2).lower()
+    for prefix, scale in units:
+        if unit.startswith(prefix):
+            return value * scale
+    return None
+
+
+def parse_limits(html):
+    # (time limit in seconds, memory limit in bytes) from a problem statement, None if not found
+    time_units = [('мс', 0.001), ('ms', 0.001), ('милли', 0.001), ('milli', 0.001), ('с', 1), ('s', 1), ('', 1)]
+    memory_units = [('к', 2**10), ('k', 2**10), ('г', 2**30), ('g', 2**30), ('м', 2**20), ('m', 2**20), ('', 2**20)]
+    limits = []
+    for cls, units in (('time-limit', time_units), ('memory-limit', memory_units)):
+        row = html.find('tr', class_=cls)
+        cells = row.find_all('td') if row is not None else []
+        limits.append(_parse_limit(cells[-1].text, units) if cells else None)
+    time_limit, memory_limit = limits
+    return time_limit, int(memory_limit) if memory_limit is not None else None
+
+
+def statement_files(html, base_url):
+    # {src / href: absolute url} of images (except TeX formulas) and attached files (PDF statements, archives, ...)
+    files = {}
+    for im in html.find_all('img', src=True):
+        if not urlparse(im['src']).path.startswith(tex_path):
+            files[im['src']] = urljoin(base_url, im['src'])
+    for a in html.find_all('a', href=True):
+        path = urlparse(a['href']).path
+        if '/download' in path or os.path.splitext(path)[1].lower() in attachment_exts:
+            files[a['href']] = urljoin(base_url, a['href'])
+    return {src: url for src, url in files.items() if urlparse(url).scheme in ('http', 'https')}
+
+
 class Statement():
-    def __init__(self, html):
+    def __init__(self, html, files=None):
+        # files: {src / href: local path} of downloaded images and attachments, links to them are replaced
+        from html2text import HTML2Text as H2T  # only needed for statements
+        files = files or {}
         images = html.find_all('img')
-        tex_path = '/testsys/tex/render/'
         for im in images:
             src_path = urlparse(im['src']).path
             m = re.match(tex_path + r'(.*)\..*', src_path)
             if m:
                 im.replace_with('$' + b64decode(m.group(1)).decode() + '$')
+            elif im['src'] in files:
+                im['src'] = files[im['src']]
+        for a in html.find_all('a', href=True):
+            if a['href'] in files:
+                a['href'] = files[a['href']]
         h2t = H2T()
         h2t.use_automatic_links = True
         h2t.mark_code = True
         h2t.body_width = 100
         h2t.protect_links = True
         def tomd(tag):
-            return h2t.handle(str(tag)).strip().replace('\\-', '-').replace('\\+', '+')
+            with span('render', 'html2text'):
+                return h2t.handle(str(tag)).strip().replace('\\-', '-').replace('\\+', '+')
 
-        delim = '\n' + '=' * 20 + '\n'
+        delim = section_delim
         test_delim = '\n' + '-' * 20 + '\n'
         try:
             title = html.find(class_='title').text.strip()
@@ -90,148 +158,551 @@ class Statement():
             if notes_el is not None:
                 hdr = notes_el.find_previous_sibling()
                 notes = '\n'.join([hdr.text.strip(), tomd(notes_el)])
-            test_data = [[cell.text for cell in test.find_all('tr')[1].find_all('td')] for test in html.find_all('table', class_='sample-tests')]
-            tests = test_delim.join('\n'.join(['>' * 10, in_, '<' * 10, out]) for (in_, out) in test_data)
+            self.tests = sample_tests(html)
+            self.time_limit, self.memory_limit = parse_limits(html)
+            tests = test_delim.join('\n'.join(['>' * 10, in_, '<' * 10, out]) for (in_, out) in self.tests)
             self.fields = [title, limits, legend, inspec, outspec, notes, tests]
             self.descr = delim.join([e for e in self.fields if e])
         except KeyboardInterrupt:
             raise
         except Exception as e:
             self.fields = []
+            self.tests = []
+            self.time_limit = self.memory_limit = None
             self.descr = delim.join(['ERROR: problem statement was not loaded', str(e)])
 
     def __str__(self):
         return self.descr
 
 
+class StatusPoller():
+    # waits for the results of several solutions with a single polling loop
+    min_delay = 0.5
+    max_delay = 4
+    backoff = 1.5  # applied to the delay on each poll while a solution is being tested
+
+    def __init__(self, client, problems, pool, labels=True, report=False):
+        # report: show the run report (tests, checker output) for any verdict, not only the compilation log of CE
+        self.client = client
+        self.pool = pool
+        self.labels = labels
+        self.report = report
+        self.pending = {problem: {'due': 0, 'delay': StatusPoller.min_delay, 'testing': False} for problem in problems}
+
+    def _report(self, problem, msg):
+        print(f'Problem {problem}: {msg}' if self.labels else msg)
+
+    def _update(self, problem, status):
+        state = self.pending[problem]
+        if status.checked:
+            self._report(problem, status)
+            if self.report or status.ce:
+                print(self.client._status_details(status, tests=self.report))
+            del self.pending[problem]
+            return
+        if status.testing:
+            if not state['testing']:
+                state['testing'] = True
+                self._report(problem, 'Testing...')  # TODO show current test??
+            state['delay'] = min(state['delay'] * StatusPoller.backoff, StatusPoller.max_delay)
+        else:
+            state['delay'] = StatusPoller.min_delay  # still in queue, the result may appear soon
+        state['due'] = time() + state['delay']
+
+    def next_poll(self):
+        # time of the next poll, None if all solutions are checked
+        return min(state['due'] for state in self.pending.values()) if self.pending else None
+
+    def poll(self):
+        now = time()
+        due = [problem for problem, state in self.pending.items() if state['due'] <= now]
+        for problem, status in zip(due, self.pool.map(self.client._get_status, due)):
+            self._update(problem, status)
+
+    def run(self):
+        while self.pending:
+            self.poll()
+            if self.pending:
+                sleep(max(0, self.next_poll() - time()))
+
+
+class LiveScreen():
+    # redraws a block of lines in place, rewriting only the changed ones
+    def __init__(self):
+        self.lines = None
+
+    def show(self, lines):
+        if not sys.stdout.isatty():
+            print('\n'.join(lines) + '\n')
+            return
+        columns, height = shutil.get_terminal_size()
+        # each line must take one row, otherwise the rows of the changed lines aren't known
+        lines = [line[:columns - 1] for line in lines]  # the last column is left empty, so the cursor doesn't wrap
+        if self.lines is None or len(lines) != len(self.lines) or len(lines) >= height:
+            sys.stdout.write('\x1b[H\x1b[2J' + '\n'.join(lines) + '\n')
+        else:
+            for i, (old, new) in enumerate(zip(self.lines, lines)):
+                if old != new:
+                    sys.stdout.write(f'\x1b[{i + 1};1H\x1b[2K{new}')
+            sys.stdout.write(f'\x1b[{len(lines) + 1};1H')
+        sys.stdout.flush()
+        self.lines = lines
+
+
+class SolutionSync():
+    # incremental download of the latest accepted solutions for one contest
+    manifest_name = '.manifest.json'
+
+    def __init__(self, client, cid, dirname, pool, jobs, downloader):
+        self.client = client
+        self.cid = cid
+        self.dirname = dirname
+        self.pool = pool
+        self.jobs = jobs
+        self.downloader = downloader
+        self.manifest_path = os.path.join(dirname, SolutionSync.manifest_name)
+        try:
+            with open(self.manifest_path) as f:
+                self.manifest = json.load(f)
+        except FileNotFoundError:
+            self.manifest = {'last_run': 0, 'problems': {}}
+
+    def _scan(self):
+        # yields new submits (newer than the last synced run), newest first
+        known = self.manifest['last_run']
+        page = 1
+        batch = 1 if known else self.jobs  # a re-run usually needs only the first page
+        while True:
+            pages = [self.pool.submit(self.client._get_submits, self.cid, p) for p in range(page, page + batch)]
+            for task in pages:
+                submits = task.result()
+                if not submits:
+                    return
+                for submit in submits:
+                    if submit[0] <= known:
+                        return
+                    yield submit
+            page += batch
+            batch = self.jobs
+
+    def run(self):
+        print(f'Contest {self.cid}: downloading solutions...')
+        last_run = self.manifest['last_run']
+        pending = []  # runs which are not checked yet, have to be rescanned next time
+        saved = self.manifest['problems']
+        seen = set()
+        downloads = {}
+        for sid, pid, result, report_url in self._scan():
+            if SolutionStatus.fin_re.match(result) is None:
+                pending.append(sid)
+                continue
+            last_run = max(last_run, sid)
+            # TODO add option to save latest solutions if no accepted are found?
+            if result != 'OK' or pid in seen:
+                continue
+            seen.add(pid)
+            if pid in saved and saved[pid]['run'] >= sid:
+                continue
+            downloads[pid] = (sid, self.pool.submit(self.client._download_source, self.downloader, self.dirname, pid, report_url))
+        if pending:
+            last_run = min(pending) - 1
+
+        for pid, (sid, task) in downloads.items():
+            filename = task.result()
+            old = saved.get(pid)
+            if old is not None and old['file'] != filename:
+                try:
+                    os.unlink(os.path.join(self.dirname, old['file']))
+                except FileNotFoundError:
+                    pass
+            saved[pid] = {'run': sid, 'file': filename}
+            print(f'Contest {self.cid}: loaded an accepted solution for {pid}!')
+        self.manifest['last_run'] = last_run
+        write_atomic(self.manifest_path, json.dumps(self.manifest, indent=1).encode())
+        if not downloads:
+            print(f'Contest {self.cid}: no new accepted solutions')
+
+
 class Client():
-    def __init__(self, nocid=False):
-        self.cfg = get_cfg()
+    session_check_interval = 600  # seconds, a valid session isn't checked again before this time
+    metadata_ttl = 24 * 3600  # seconds, problem lists and statements saved to the config are reloaded after this time
+
+    def __init__(self, nocid=False, session=None):
+        # session: an already used Session, to reuse its connections
+        self.cfg = get_cfg()  # settings, other records of the store are loaded when needed
+        self.store = Store()
         self.domain = self.cfg['domain']
+        self.base_url = self.cfg.get('scheme', 'https') + '://' + self.domain  # scheme is changed only by benchmarks
         contest = self.cfg['contest']
         if contest == 0 and not nocid:
             print('ERROR: No contest was selected. Run "yacontest select <id>" first')
             sys.exit(1)
         self._select(contest)
-        self.problems = self.cfg.get('problems')
+        self.interactive = True  # False: raise YacontestError instead of asking the user
+
+        self._auth_lock = threading.Lock()
+        self._auth_gen = 0  # incremented after each login, so concurrent requests don't log in twice
+        self._cfg_lock = threading.Lock()  # metadata is changed from worker threads
+        self._contests = {}  # {contest id: metadata}, loaded from the store
 
-        self.http = requests.Session()
+        self.cache = ResponseCache(os.path.join(cache_dir(), 'http'))
+        self.http = session if session is not None else Session()
         self.http.headers['User-Agent'] = 'Mozilla/5.0 (Windows NT 10.0) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/40.0.2214.93 Safari/537.36'
-        if self.cfg.get('cookies') is not None:
-            self.http.cookies = self.cfg['cookies']
+        cookies = self.store.load('cookies', {})
+        # the session may be shared with previous commands (the daemon), which may have used another config
+        self.http.cookies = cookies['jar'] if cookies.get('jar') is not None else requests.cookies.RequestsCookieJar()
+        self._session_checked = cookies.get('checked', 0)
 
     def _select(self, cid):
         self.contest = cid
-        self.prefix = f'https://{self.domain}/contest/{cid}'
+        self.prefix = self._prefix(cid)
+
+    def _prefix(self, cid):
+        return f'{self.base_url}/contest/{cid}'
+
+    def _set_pool_size(self, size):
+        self.http.set_pool_size(size)
+
+    def _location(self, r):
+        # where the response leads, for responses with redirects which weren't followed
+        return urljoin(r.url, r.headers['Location']) if r.is_redirect else r.url
 
     def _check_result(self, r):
-        return urlparse(r.url).path != f'/contest/{self.contest}/enter/'
+        return re.match(r'/contest/\d+/enter/$', urlparse(self._location(r)).path) is None
+
+    def _login_link(self, r):
+        # the login link on an enter page, None if the session is valid
+        return parse(r.text, 'a', 'link_access_login').find('a', class_='link_access_login')
 
     def _update_cookies(self, r):
-        soup = BS(r.text, "html.parser")
-        link = soup.find('a', class_='link_access_login')
+        link = self._login_link(r)
         if not link:
-            print('ERROR: Contest is not available, check the URL:')
-            print(self.prefix + '/enter')
-            sys.exit(1)
+            raise YacontestError(f'Contest is not available, check the URL:\n{r.url}')
         authpath = link['href']
-        url = f"https://{self.domain}{authpath}"
+        url = f"{self.base_url}{authpath}"
         r = self.http.get(url)
-        soup = BS(r.text, "html.parser")
+        soup = parse(r.text, 'form')
         form = soup.find('form')
         data = {e['name']: e.get('value', '') for e in form.find_all('input')}
         data['login'] = self.cfg['login']
         data['password'] = self.cfg['password']
         if not data['password']:
             login = data['login']
+            if not self.interactive:
+                raise YacontestError(f'{login} is not authorized, password is needed to continue')
             print(f'{login} is not authorized, password is needed to continue')
             data['password'] = getpass()
         r = self.http.post(url, data=data)
         if urlparse(r.url).path == '/login/':
-            print('ERROR: Incorrect login or password, try again')
-            print(f'Your login is "{self.cfg["login"]}". If it\'s incorrect, run "yacontest config"')
             self.cfg['password'] = ''
-            set_cfg(self.cfg)
-            sys.exit(1)
-        self.cfg['cookies'] = self.http.cookies
-        set_cfg(self.cfg)
+            with self.store.changing(settings_record) as cfg:
+                cfg['password'] = ''
+            raise YacontestError('Incorrect login or password, try again\n'
+                                 f'Your login is "{self.cfg["login"]}". If it\'s incorrect, run "yacontest config"')
+        self._session_checked = time()
+        self.store.save('cookies', {'jar': self.http.cookies, 'checked': self._session_checked})
+        self._forget_forms()
+
+    def _forget_forms(self):
+        # saved forms and cached problem pages contain the token of the old session (sk),
+        # they are loaded again after a login
+        try:
+            cids = [int(name) for name in os.listdir(self.store.path('contests')) if name.isnumeric()]
+        except FileNotFoundError:
+            return
+        for cid in cids:
+            meta = self.store.load(f'contests/{cid}', {})
+            for url in meta.get('problems', (0, {}))[1].values():
+                self._uncache(url)
+            if 'forms' in meta:
+                with self._changing_meta(cid) as meta:
+                    meta.pop('forms', None)
+
+    def _login(self, enter_url=None, enter_page=None):
+        # enter_page: an already loaded enter page (a response redirected to it), otherwise it's loaded from enter_url
+        if enter_page is None:
+            enter_page = self.http.get(enter_url or self.prefix + '/enter/')
+        with span('auth', 'login'):
+            self._update_cookies(enter_page)
+
+    def _relogin(self, gen, enter_url=None, enter_page=None):
+        with self._auth_lock:
+            if self._auth_gen == gen:  # otherwise another thread has already logged in
+                self._login(enter_url, enter_page)
+                self._auth_gen += 1
+
+    def _session_expired(self):
+        # True if there are no cookies for the server or some of them have expired
+        host = self.domain.split(':')[0]
+        cookies = [c for c in self.http.cookies if ('.' + host).endswith('.' + c.domain.lstrip('.'))]
+        return not cookies or any(c.is_expired() for c in cookies)
+
+    def _ensure_session(self, cid=None):
+        # called before a batch of requests (or a POST), so that they don't find out one by one that the session
+        # has expired. The session is checked if its cookies have expired or it wasn't checked for a while
+        if not self._session_expired() and time() - self._session_checked < Client.session_check_interval:
+            return
+        gen = self._auth_gen
+        with self._auth_lock:
+            if self._auth_gen != gen:
+                return
+            with span('auth', 'check'):
+                r = self.http.get(self._prefix(self.contest if cid is None else cid) + '/enter/')
+            if self._login_link(r) is None:  # the enter page has a login link only if the session is invalid
+                self._session_checked = time()
+                self.store.save('cookies', {'jar': self.http.cookies, 'checked': self._session_checked})
+                return
+            self._login(enter_page=r)  # the page is needed for login anyway, so the check is free in this case
+            self._auth_gen += 1
+
+    def _req_get(self, url, params=None, revalidate=False):
+        # revalidate: don't use a cached response without checking that it's up to date
+        ttl = ResponseCache.ttl(url, params)
+        if ttl is None:
+            return self._req_get_uncached(url, params)
+        key = ResponseCache.key(url, params, self.cfg['login'])
+        entry = self.cache.get(key)
+        headers = {}
+        if entry is not None:
+            if ResponseCache.fresh(entry, ttl) and not revalidate:
+                with span('cache', url_class(url), bytes=len(entry['content'])):
+                    return self._cached_response(entry)
+            if entry['etag']:
+                headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                headers['If-Modified-Since'] = entry['last_modified']
+        r = self._req_get_uncached(url, params, headers)
+        if r.status_code == 304 and entry is not None:
+            entry['time'] = time()
+            self.cache.put(key, entry)
+            return self._cached_response(entry)
+        etag = r.headers.get('ETag')
+        last_modified = r.headers.get('Last-Modified')
+        if r.status_code == 200 and (ttl or etag or last_modified):
+            self.cache.put(key, {
+                'url': r.url, 'status': r.status_code, 'headers': cacheable_headers(r.headers), 'content': r.content,
+                'encoding': r.encoding, 'etag': etag, 'last_modified': last_modified,
+                'time': time(),
+            })
+        return r
 
-    def _req_get(self, url, params=None):
-        r = self.http.get(url, params=params)
+    def _req_get_uncached(self, url, params=None, headers=None, stream=False):
+        gen = self._auth_gen
+        r = self.http.get(url, params=params, headers=headers, stream=stream)
         if not self._check_result(r):
-            self._update_cookies(r)
-            r = self.http.get(url, params=params)
+            self._relogin(gen, enter_page=r)
+            r.close()
+            r = self.http.get(url, params=params, headers=headers, stream=stream)
         return r
 
-    def _req_post(self, url, params=None, data=None):
-        r = self.http.post(url, params=params, data=data)
+    def _downloader(self, dirname):
+        # streamed downloads to subdirectories of dirname, identical files are stored in dirname/.blobs once
+        return Downloader(lambda url: self._req_get_uncached(url, stream=True), os.path.join(dirname, '.blobs'))
+
+    @staticmethod
+    def _cached_response(entry):
+        r = requests.Response()
+        r.url = entry['url']
+        r.status_code = entry['status']
+        r.headers = CaseInsensitiveDict(entry['headers'])
+        r.encoding = entry['encoding']
+        r._content = entry['content']
+        return r
+
+    def _uncache(self, url, params=None):
+        self.cache.invalidate(ResponseCache.key(url, params, self.cfg['login']))
+
+    def _req_post(self, url, params=None, data=None, files=None):
+        # redirects aren't followed, the result is in the Location header (see _location)
+        # a request rejected because of an invalid session isn't processed by the server, so it's safe to repeat it,
+        # but _ensure_session should be called before to avoid sending the data twice
+        gen = self._auth_gen
+        r = self.http.post(url, params=params, data=data, files=files, allow_redirects=False)
         if not self._check_result(r):
-            self._update_cookies(r)
-            r = self.http.post(url, params=params, data=data)
+            self._relogin(gen, enter_url=self._location(r))
+            for _, f in (files or {}).values():
+                f.seek(0)
+            r = self.http.post(url, params=params, data=data, files=files, allow_redirects=False)
         return r
 
-    def _get_status(self, problem):
-        try:
-            url = self._get_problems()[problem]
-        except KeyError:
-            print(f'Invalid problem id, available problems: {", ".join(self._get_problems().keys())}')
-            sys.exit(1)
+    def _get_status(self, problem, cid=None):
+        url = self._get_problem_url(problem, cid)
         r = self._req_get(url, params={'ajax': 'submit-table'})
-        soup = BS(r.json()['result'], "html.parser")
+        soup = parse(r.json()['result'], 'tr')
         rows = soup.find_all('tr')
         if len(rows) < 2:
-            print('No solutions found!')
-            sys.exit(1)
+            raise YacontestError('No solutions found!')
         titles = [e.text for e in rows[0].find_all('th')]
         cells = [e.text for e in rows[1].find_all('td')]
         return SolutionStatus(titles, cells)
  
-    def _status_details(self, status):
-        url = self.prefix + f'/run-report/{status.sid}/'
-        r = self._req_get(url)
-        soup = BS(r.text, "html.parser")
-        details = [e.text.strip() for e in soup.find_all('pre')]
-        if not details:
-            details = ['No description available']
-        delim = '\n' + '-' * 20 + '\n'
-        return delim[1:] + delim.join(details) + delim[:-1]
-
-    def _get_problems(self):
-        if self.problems:
-            return self.problems
-        url = self.prefix + '/problems/'
-        r = self._req_get(url)
-        soup = BS(r.text, "html.parser")
+    def _run_report(self, status, cid=None):
+        # the run report parsed while it's downloaded (see ReportParser), reports of checked runs never change,
+        # so they are parsed once and cached
+        url = self._prefix(self.contest if cid is None else cid) + f'/run-report/{status.sid}/'
+        key = ResponseCache.key(url, {'parsed': 1}, self.cfg['login'])
+        if status.checked:
+            entry = self.cache.get(key)
+            if entry is not None:
+                return entry['report']
+        parser = ReportParser()
+        with self._req_get_uncached(url, stream=True) as r:
+            r.encoding = r.encoding or 'utf-8'
+            with span('parse', 'run-report', backend='html.parser') as s:
+                size = 0
+                for chunk in r.iter_content(64 * 2**10, decode_unicode=True):
+                    parser.feed(chunk)
+                    size += len(chunk)
+                parser.close()
+                s.set(bytes=size)
+        report = parser.report()
+        if status.checked:
+            self.cache.put(key, {'report': report, 'time': time()})  # a report of a checked run never changes
+        return report
+
+    def _status_details(self, status, cid=None, tests=False):
+        # tests: also show the table of tests
+        report = self._run_report(status, cid)
+        details = format_logs(report)
+        return format_tests(report) + '\n' + details if tests else details
+
+    def _meta(self, cid=None):
+        # metadata of a contest, a separate record of the store, so it's kept when another contest is selected:
+        # {'problems': (time, {problem id: url}), 'forms': {problem id: form, see _get_form},
+        #  'statements': {problem id: {'time', 'hash', 'tests', 'limits'}}, 'standings_index': {login: page}}
+        cid = int(self.contest if cid is None else cid)
+        with self._cfg_lock:
+            if cid not in self._contests:
+                self._contests[cid] = self.store.load(f'contests/{cid}', {})
+            return self._contests[cid]
+
+    @contextmanager
+    def _changing_meta(self, cid=None):
+        # with self._changing_meta(cid) as meta: meta[...] = ...; the record is reloaded before the change
+        # (another process may have changed it) and saved at exit
+        cid = int(self.contest if cid is None else cid)
+        with self._cfg_lock, self.store.changing(f'contests/{cid}', {}) as meta:
+            yield meta
+            self._contests[cid] = meta
+
+    def _fresh(self, saved_time):
+        return time() - saved_time < Client.metadata_ttl
+
+    def _get_problems(self, cid=None, refresh=False):
+        # refresh: reload the list even if the saved one is fresh
+        saved = self._meta(cid).get('problems')
+        if saved is not None and not refresh and self._fresh(saved[0]):
+            return saved[1]
+        problems = self._fetch_problems(self.contest if cid is None else cid, refresh)
+        with self._changing_meta(cid) as meta:
+            meta['problems'] = (time(), problems)
+        return problems
+
+    def _fetch_problems(self, cid, refresh=False):
+        url = self._prefix(cid) + '/problems/'
+        r = self._req_get(url, revalidate=refresh)
+        soup = parse(r.text, 'ul')
         problems = soup.find_all('ul')[-1]
-        self.problems = {e.find('a')['href'].split('/')[-2].lower(): 'https://' + self.domain + e.find('a')['href'] for e in problems.find_all('li')}  # NOTE assuming that url doesn't include domain and ends with "/", does YC guarantee this?
-        self.cfg['problems'] = self.problems
-        set_cfg(self.cfg)
-        return self.problems
+        return {e.find('a')['href'].split('/')[-2].lower(): self.base_url + e.find('a')['href'] for e in problems.find_all('li')}  # NOTE assuming that url doesn't include domain and ends with "/", does YC guarantee this?
+
+    def _load_files(self, downloader, files_dir, files, old):
+        # downloads images and attachments of a statement to files_dir (removing ones which aren't used anymore),
+        # old: {src / href: file name} downloaded before, they are kept if the download fails
+        # returns ({src / href: file name}, number of failed downloads)
+        names = {}
+        failed = 0
+        if files:
+            os.makedirs(files_dir, exist_ok=True)
+        for src, url in files.items():
+            try:
+                names[src] = downloader.download(url, files_dir)
+            except (YacontestError, requests.RequestException):
+                failed += 1
+                if src in old and os.path.exists(os.path.join(files_dir, old[src])):
+                    names[src] = old[src]
+        if os.path.isdir(files_dir):
+            for name in set(os.listdir(files_dir)) - set(names.values()):
+                os.unlink(os.path.join(files_dir, name))
+            if not os.listdir(files_dir):
+                os.rmdir(files_dir)
+        return names, failed
+
+    def _load_problem(self, downloader, dirname, pid, url, manifest):
+        # returns (a short description of what was done, new manifest, statement metadata),
+        # manifest: {'html': hash, 'descr': hash, 'files': {src / href: file name}} or None
+        r = self._req_get(url, revalidate=True)
+        soup = parse(r.text, 'div', 'problem-statement')
+        html = soup.find("div", class_="problem-statement")
+        html_hash = hashlib.sha1(str(html).encode()).hexdigest()
+        saved = self._statement_meta(pid, html, html_hash)  # saved by load_problems
+        path = os.path.join(dirname, f'{pid}.txt')
+        files_dir = os.path.join(dirname, f'{pid}.files')
+        exists = os.path.exists(path)
+        old_files = manifest.get('files') if manifest is not None else None
+        if not isinstance(old_files, dict):  # not loaded yet
+            old_files = None
+        if exists and manifest is not None and manifest['html'] == html_hash and old_files is not None and \
+                all(os.path.exists(os.path.join(files_dir, name)) for name in old_files.values()):
+            return 'not changed', manifest, saved
+        names, failed = self._load_files(downloader, files_dir, statement_files(html, r.url), old_files or {})
+        with span('render', 'statement'):
+            statement = Statement(html, {src: f'{pid}.files/{name}' for src, name in names.items()})
+        descr = str(statement) + '\n'
+        descr_hash = hashlib.sha1(descr.encode()).hexdigest()
+        # the statement is processed again next time if some files weren't downloaded
+        new_manifest = {'html': html_hash if not failed else None, 'descr': descr_hash, 'files': names}
+        result = 'not changed'
+        if not exists or manifest is None or manifest['descr'] != descr_hash:
+            write_atomic(path, descr.encode())  # editors which have the file open never see a half-written file
+            result = 'updated' if exists else 'downloaded'
+        if failed:
+            result += f', {failed} file(s) were not downloaded'
+        return result, new_manifest, saved
 
-    def load_problems(self):
+    def load_problems(self, jobs=1):
         dirname = os.path.join(os.getcwd(), 'problems')
+        manifest_path = os.path.join(dirname, '.manifest.json')
+        manifest = {}  # {problem id: {'html': hash of statement html, 'descr': hash of the text file}}
         if os.path.exists(dirname):
-            if os.path.isdir(dirname):
+            if not os.path.isdir(dirname):
+                print('ERROR: "./problems" is not a directory! Delete/rename it manually to continue')
+                return
+            if os.path.exists(manifest_path):  # created by yacontest, only changed statements are updated
+                with open(manifest_path) as f:
+                    manifest = json.load(f)
+            elif os.listdir(dirname):
                 if input('"./problems/" already exists! Overwrite? [yN]: ').lower().startswith('y'):
                     clean_dir(dirname)
                 else:
                     return
-            else:
-                print('ERROR: "./problems" is not a directory! Delete/rename it manually to continue')
-                return
         else:
             os.mkdir(dirname)
         print('Loading problem list...')
+        self._ensure_session()
         problems = self._get_problems()
-        for pid, url in problems.items():
-            print(f'Downloading problem {pid}...')
-            r = self._req_get(url)
-            soup = BS(r.text, "html.parser")
-            statement = Statement(soup.find("div", class_="problem-statement"))
-            with open(os.path.join(dirname, f'{pid}.txt'), 'w') as f:
-                f.write(str(statement) + '\n')
-
-    def load_code(self, ids=[]):
+        self._set_pool_size(jobs)
+        downloader = self._downloader(dirname)
+        statements = {}
+        tasks = []
+        try:
+            with ThreadPoolExecutor(jobs) as pool:
+                # each file is written by its worker, progress is printed in the original order
+                tasks += [(pid, pool.submit(self._load_problem, downloader, dirname, pid, url, manifest.get(pid)))
+                          for pid, url in problems.items()]
+                for pid, task in tasks:
+                    result, manifest[pid], statements[pid] = task.result()
+                    print(f'Problem {pid}: {result}')
+        finally:  # if some problem has failed, the written statements are still recorded
+            for pid, task in tasks:
+                if pid not in statements and task.done() and not task.cancelled() and task.exception() is None:
+                    _, manifest[pid], statements[pid] = task.result()
+            with self._changing_meta() as meta:  # a single write of the record
+                meta.setdefault('statements', {}).update(statements)
+            write_atomic(manifest_path, json.dumps(manifest, indent=1).encode())
+        downloader.cleanup()
+        self._register_archive(dirname, 'problems', self.contest)
+
+    def load_code(self, ids=[], jobs=1):
         if not ids:
             ids = [self.contest]
 
@@ -243,75 +714,103 @@ class Client():
         else:
             os.mkdir(basedir)
 
+        contests = []
         for cid in ids:
             dirname = os.path.join(basedir, str(cid))
             if os.path.exists(dirname):
-                if os.path.isdir(dirname):
+                if not os.path.isdir(dirname):
+                    print(f'ERROR: "./solutions/{cid}" is not a directory! Skipping contest {cid}')
+                    continue
+                if not os.path.exists(os.path.join(dirname, SolutionSync.manifest_name)) and os.listdir(dirname):
                     if input(f'"./solutions/{cid}/" already exists! Overwrite? [yN]: ').lower().startswith('y'):
                         clean_dir(dirname)
                     else:
                         print(f'Skipping contest {cid}')
                         continue
-                else:
-                    print(f'ERROR: "./solutions/{cid}" is not a directory! Skipping contest {cid}')
-                    continue
             else:
                 os.mkdir(dirname)
+            contests.append((cid, dirname))
+        if not contests:
+            return
+
+        self._ensure_session(contests[0][0])
+        self._set_pool_size(jobs)
+        downloader = self._downloader(basedir)  # the same solution is stored once for all contests
+        # contest workers only wait for fetch tasks, fetch tasks never wait, so two pools can't deadlock
+        with ThreadPoolExecutor(jobs) as fetch_pool, ThreadPoolExecutor(min(jobs, len(contests))) as pool:
+            tasks = [pool.submit(SolutionSync(self, cid, dirname, fetch_pool, jobs, downloader).run) for cid, dirname in contests]
+            for task in tasks:
+                task.result()
+        downloader.cleanup()
+        self._register_archive(basedir, 'solutions')
+
+    def _register_archive(self, dirname, kind, contest=None):
+        # "search" indexes files from registered directories, so it finds them from any working directory
+        try:
+            index = SearchIndex()
+        except YacontestError:  # no FTS5, search isn't available anyway
+            return
+        index.add_root(dirname, kind, contest)
+        index.close()
 
-            if self.contest != cid:  # don't reset problems if no cids were supplied
-                self.problems = None  # looks awful
-            self._select(cid)  # refactor?
-            print(f'Selected contest {cid}, downloading solutions...')
-            page = 1
-            saved_problems = set()
-            while self._dump_solutions(dirname, page, saved_problems):
-                page += 1
-
-    def _dump_solutions(self, dirname, page, saved_problems):
-        # NOTE may work incorrectly for large lists (> 100 submits, if YC uses multipage) (not tested)
-        url = self.prefix + '/submits'
+    def _get_submits(self, cid, page):
+        # returns [(run id, problem id, verdict, report url)], newest first
+        url = self._prefix(cid) + '/submits'
         r = self._req_get(url, params={'p': page})
-        soup = BS(r.text, "html.parser")
-        rows = soup.find_all('tr')
-        if len(rows) < 2:
-            return False
-        # TODO add option to save latest solutions if no accepted are found?
-        rows = rows[1:]
-        ext_p = re.compile(r'filename\*?=.+(\.\w+)', re.I) # NOTE assuming that extension is alphanumeric # TODO refactor? ext can be followed by a quote
+        soup = parse(r.text, 'tr')
+        rows = soup.find_all('tr')[1:]
+        submits = []
         for row in rows:
             a_pid, a_res, a_rep = row.find_all('a') # NOTE are links always present??
-            pid = a_pid.text.lower()
-            if pid in saved_problems:
-                continue
-            result = a_res.text
-            if result != 'OK':
-                continue
-            filepath = os.path.join(dirname, pid)
-            #NOTE assuming URL doesn't include domain
-            url = 'https://' + self.domain + a_rep['href'].replace('run-report', 'download-source')  # one less request, shouldn't break until YC changes URLs
-            r = self._req_get(url)
-            matches = ext_p.findall(r.headers['content-disposition'])
-            ext = matches[0] if matches else ''
-            with open(filepath + ext, 'wb') as f:
-                f.write(r.content)
-            print(f'Loaded an accepted solution for {pid}!')
-            saved_problems.add(pid)
-        return True
-
-    def submit(self, problem, filename, wait, compiler=None):
-        if compiler is None:
-            compiler = self.cfg.get('lang')
-        problem = problem.lower()
-        if not os.path.isfile(filename):
-            print('ERROR: File not found')
-            sys.exit(1)
+            sid = int(a_rep['href'].rstrip('/').split('/')[-1])
+            submits.append((sid, a_pid.text.lower(), a_res.text, a_rep['href']))
+        return submits
+
+    def _source_url(self, report_url):
+        #NOTE assuming URL doesn't include domain
+        return self.base_url + report_url.replace('run-report', 'download-source')  # one less request, shouldn't break until YC changes URLs
+
+    @staticmethod
+    def _source_ext(r):
+        name = disposition_name(r.headers)
+        ext = os.path.splitext(name)[1] if name is not None else ''
+        return ext if re.match(r'\.\w+$', ext) else ''  # NOTE assuming that extension is alphanumeric
+
+    def _fetch_source(self, report_url):
+        # returns (extension, source)
+        r = self._req_get(self._source_url(report_url))
+        return self._source_ext(r), r.content
+
+    def _download_source(self, downloader, dirname, pid, report_url):
+        # the source is streamed to dirname/<problem id><extension>, returns the file name
+        return downloader.download(self._source_url(report_url), dirname, lambda r: pid + self._source_ext(r))
+
+    def _get_problem_url(self, problem, cid=None):
+        problems = self._get_problems(cid)
+        if problem not in problems:  # the saved list may be outdated
+            problems = self._get_problems(cid, refresh=True)
         try:
-            url = self._get_problems()[problem]
+            return problems[problem]
         except KeyError:
-            print(f'Invalid problem id, available problems: {", ".join(self._get_problems().keys())}')
-            sys.exit(1)
+            raise YacontestError(f'Invalid problem id, available problems: {", ".join(problems.keys())}') from None
+
+    def _saved_form(self, problem, cid=None):
+        return self._meta(cid).get('forms', {}).get(problem)
+
+    def _get_form(self, problem, cid=None, cached=True):
+        # returns (form data, file field, {compiler name: id} or None if compiler is fixed, compiler field)
+        # forms are saved to the config, so a solution can be sent without loading the problem page
+        # cached=False: reload the form, e.g. if the saved one was rejected
+        if cid is None:
+            cid = self.contest
+        form = self._saved_form(problem, cid) if cached else None
+        if form is not None:
+            return (dict(form[0]), *form[1:])
+        url = self._get_problem_url(problem, cid)
+        if not cached:
+            self._uncache(url)
         r = self._req_get(url)
-        soup = BS(r.text, "html.parser")
+        soup = parse(r.text, 'form')
         form = soup.find_all('form')[-1]
         formdata = {}
         file_field = None
@@ -327,105 +826,356 @@ class Client():
                 compiler_choice = False
             else:
                 formdata[name] = el['value']
+        compilers = None
+        compiler_field = None
         if compiler_choice:
             for el in form.find_all('select'):
                 name = el['name']
                 if name.endswith('compilerId'):
-                    available = {}
-                    if compiler is not None:
-                        compiler = re.sub(r'\s+', ' ', compiler)
-                    for comp in el.find_all('option'):
-                        cname = re.sub(r"\s+", ' ', comp.text)
-                        if cname == compiler:
-                            formdata[name] = comp['value']
-                            break
-                        available[cname] = comp['value']
-                    else:
-                        if compiler is not None:
-                            print('Unknown language: {}'.format(compiler))
-                        compiler = choice('Select a language/compiler:', list(available.keys()))
-                        if compiler is not None:
-                            formdata[name] = available[compiler]
-                        else:
-                            print('Incorrect choice, try again')
-                            sys.exit(1)
+                    compilers = {re.sub(r"\s+", ' ', comp.text): comp['value'] for comp in el.find_all('option')}
+                    compiler_field = name
                     break
-        url = self.prefix + '/submit/'
-        r = self.http.post(url, data=formdata, files={file_field: (filename, open(filename, 'r'))})
-        err = parse_qs(urlparse(r.url).query).get('error')
-        if err:
-            print('Error:', err[0])
+        with self._changing_meta(cid) as meta:
+            meta.setdefault('forms', {})[problem] = (formdata, file_field, compilers, compiler_field)
+        return dict(formdata), file_field, compilers, compiler_field
+
+    def _choose_compiler(self, compilers, compiler):
+        if compiler is not None:
+            compiler = re.sub(r'\s+', ' ', compiler)
+            if compiler in compilers:
+                return compiler
+            if not self.interactive:
+                raise YacontestError('Unknown language: {}'.format(compiler))
+            print('Unknown language: {}'.format(compiler))
+        if not self.interactive:
+            raise YacontestError('Language is not selected')
+        compiler = choice('Select a language/compiler:', list(compilers.keys()))
+        if compiler is None:
+            print('Incorrect choice, try again')
             sys.exit(1)
-        print('Uploaded!')
-        if wait:
-            print('Waiting...')
-            status = self._get_status(problem)
-            testing = False
-            last_req = time()
-            while not status.checked:
-                if status.testing and not testing:
-                    testing = True
-                    print('Testing...')  # TODO show current test??
-                sleep(max(0, 0.5 - (time() - last_req)))
-                status = self._get_status(problem)
-                last_req = time()
-            print(status)
-            if status.ce:
-                print(self._status_details(status))
-
-    def show_leaderboard(self, page=1):
-        #TODO get additional info, print as a table?
-        url = self.prefix + '/standings/'
-        params = {'p': page}
-        r = self._req_get(url, params=params)
-        soup = BS(r.text, "html.parser")
+        return compiler
+
+    def _set_compilers(self, forms, compiler):
+        # fills compiler fields, returns the chosen compiler (asked at most once if all problems have the same compilers)
+        for formdata, _, compilers, compiler_field in forms:
+            if compilers is not None:
+                compiler = self._choose_compiler(compilers, compiler)
+                formdata[compiler_field] = compilers[compiler]
+        return compiler
+
+    def _upload(self, filename, formdata, file_field, cid=None):
+        url = self._prefix(self.contest if cid is None else cid) + '/submit/'
+        with open(filename, 'rb') as f:
+            r = self._req_post(url, data=formdata, files={file_field: (filename, f)})
+        self.http.uploaded = True
+        err = parse_qs(urlparse(self._location(r)).query).get('error')
+        return err[0] if err else None
+
+    def _send_solution(self, problem, filename, compiler, cid=None):
+        # returns (error message or None, chosen compiler)
+        saved = self._saved_form(problem, cid) is not None
+        for cached in (True, False) if saved else (True,):  # a saved form may be outdated, retry once with a fresh one
+            form = self._get_form(problem, cid, cached)
+            compiler = self._set_compilers([form], compiler)
+            err = self._upload(filename, form[0], form[1], cid)
+            if err is None:
+                break
+        return err, compiler
+
+    def submit(self, problem, filename, wait, compiler=None, report=False):
+        self.submit_many([(problem, filename)], wait, compiler, report=report)
+
+    def submit_many(self, solutions, wait, compiler=None, jobs=4, report=False):
+        if compiler is None:
+            compiler = self.cfg.get('lang')
+        solutions = [(problem.lower(), filename) for problem, filename in solutions]
+        for problem, filename in solutions:
+            if not os.path.isfile(filename):
+                print(f'ERROR: File not found: {filename}')
+                sys.exit(1)
+            self._get_problem_url(problem)
+        batch = len(solutions) > 1
+
+        self._ensure_session()
+        self._set_pool_size(jobs)
+        with ThreadPoolExecutor(jobs) as pool:
+            saved = [self._saved_form(problem) is not None for problem, _ in solutions]
+            forms = list(pool.map(self._get_form, [problem for problem, _ in solutions]))
+            compiler = self._set_compilers(forms, compiler)
+            uploads = [pool.submit(self._upload, filename, formdata, file_field)
+                       for (_, filename), (formdata, file_field, _, _) in zip(solutions, forms)]
+            errors = [task.result() for task in uploads]
+            # a saved form may be outdated (e.g. the list of compilers has changed), retry once with a fresh one
+            stale = [i for i, err in enumerate(errors) if err and saved[i]]
+            if stale:
+                forms = list(pool.map(lambda i: self._get_form(solutions[i][0], cached=False), stale))
+                compiler = self._set_compilers(forms, compiler)
+                uploads = [pool.submit(self._upload, solutions[i][1], formdata, file_field)
+                           for i, (formdata, file_field, _, _) in zip(stale, forms)]
+                for i, task in zip(stale, uploads):
+                    errors[i] = task.result()
+            uploaded = []
+            for (problem, _), err in zip(solutions, errors):
+                label = f'Problem {problem}: ' if batch else ''
+                if err:
+                    print(f'{label}Error:', err)
+                    if not batch:
+                        sys.exit(1)
+                    continue
+                print(f'{label}Uploaded!')
+                uploaded.append(problem)
+            if wait and uploaded:
+                print('Waiting...')
+                StatusPoller(self, uploaded, pool, batch, report).run()
+
+    def watch(self, problem, filename, compiler=None, debounce=0.3, report=False):
+        # sends the file each time its content changes and shows the results
+        from .watch import FileWatcher
+        problem = problem.lower()
+        if not os.path.isfile(filename):
+            raise YacontestError(f'File not found: {filename}')
+        self._get_problem_url(problem)
+        if compiler is None:
+            compiler = self.cfg.get('lang')
+
+        def digest():
+            try:
+                with open(filename, 'rb') as f:
+                    return hashlib.sha1(f.read()).hexdigest()
+            except OSError:  # may be missing for a moment while an editor replaces it
+                return None
+
+        last = digest()
+        poller = None
+        print(f'Watching {filename}, press Ctrl+C to stop')
+        with FileWatcher(filename) as watcher, ThreadPoolExecutor(1) as pool:
+            while True:
+                due = poller.next_poll() if poller is not None else None
+                if not watcher.wait(None if due is None else max(0, due - time())):
+                    poller.poll()
+                    continue
+                watcher.settle(debounce)
+                current = digest()
+                if current is None or current == last:
+                    continue
+                last = current
+                if poller is not None and poller.pending:
+                    print('Superseded by a new version')  # the old solution is still checked, but its result isn't needed
+                poller = None
+                self._ensure_session()
+                err, compiler = self._send_solution(problem, filename, compiler)
+                if err:
+                    print(strftime('[%H:%M:%S]'), 'Error:', err)
+                    continue
+                print(strftime('[%H:%M:%S]'), 'Uploaded!')
+                poller = StatusPoller(self, [problem], pool, labels=False, report=report)
+
+    def _get_standings_page(self, page, old=None, cid=None):
+        # returns {'rows': [[cell text]], 'pages': number of pages, ...} or None if the page is empty
+        # old: previous result for this page, its rows are reused if the page hasn't changed
+        url = self._prefix(self.contest if cid is None else cid) + '/standings/'
+        headers = {}
+        if old is not None and old['etag']:
+            headers['If-None-Match'] = old['etag']
+        r = self._req_get_uncached(url, {'p': page}, headers)
+        if r.status_code == 304:
+            return old
+        digest = hashlib.sha1(r.content).hexdigest()
+        if old is not None and old['hash'] == digest:
+            return old
+        soup = parse(r.text, 'table')
         table = soup.find('table')
         if table is None:
-            print('No results, try another page...')
-            return
-        data = [tr.find_all('td') for tr in table.find_all('tr')[1:]]
-        last_task = None # element after last task
+            return None
+        trs = table.find_all('tr')
+        data = [tr.find_all('td') for tr in trs[1:]]
+        last_task = 2 # element after last task
         if data:
             row = data[0]
+            last_task = len(row)
             for i in range(2, len(row)):
                 if row[i].find('div') is None:
                     last_task = i
                     break
-        text = [[row[0].text, row[1].text, *[el.find('div').text for el in row[2:last_task]], *[el.text for el in row[last_task:]]] for row in data]
-        cell_sizes = [max(map(len, col)) for col in zip(*text)]
-        lines = []
-        fmtstr = '  '.join(['{{:{}s}}'.format(sz) for sz in cell_sizes])
-        for row in text:
-            lines.append(fmtstr.format(*row)
-)
-        print('\n'.join(lines))
-
-    def show_status(self, problem):
+        rows = [[row[0].text, row[1].text, *[el.find('div').text for el in row[2:last_task]], *[el.text for el in row[last_task:]]] for row in data]
+        # acceptance times are shown below the results
+        times = [[el.text.replace(el.find('div').text, '', 1).strip() or None for el in row[2:last_task]] for row in data]
+        problems = [th.text.strip() for th in trs[0].find_all('th')[2:last_task]] if trs else []
+        pages = max([page] + [int(p) for p in re.findall(r'[?&;]p=(\d+)', r.text)])  # pager links
+        return {'rows': rows, 'times': times, 'problems': problems, 'pages': pages, 'hash': digest, 'etag': r.headers.get('ETag')}
+
+    def _get_standings(self, page, all_pages, pool, old=None):
+        # returns {page number: page}, old: result of the previous call
+        old = old or {}
+        first = self._get_standings_page(page, old.get(page))
+        if first is None:
+            return {}
+        result = {page: first}
+        if all_pages:
+            rest = [p for p in range(1, first['pages'] + 1) if p != page]
+            for p, data in zip(rest, pool.map(lambda p: self._get_standings_page(p, old.get(p)), rest)):
+                if data is not None:
+                    result[p] = data
+        return result
+
+    def _record_standings(self, pages):
+        pages = list(pages)
+        history = History()
+        history.record(self.contest, pages[0]['problems'], [row for data in pages for row in data['rows']],
+                       [t for data in pages for t in data['times']])
+        history.close()
+
+    @staticmethod
+    def _find_row(rows, login):
+        # index of the participant's row, the participant column may contain a name in addition to the login
+        pattern = re.compile(r'(?<![\w.-])' + re.escape(login) + r'(?![\w.-])', re.I)
+        for i, row in enumerate(rows):
+            if pattern.search(row[1]):
+                return i
+        return None
+
+    def _find_participant(self, login, pool, jobs):
+        # returns (page number, page) or None
+        index = self._meta().get('standings_index', {})  # {login: page}
+        guess = index.get(login, 1)  # rank usually changes slowly, so the cached page or its neighbours are checked first
+        first = self._get_standings_page(guess)
+        found = None
+        if first is not None and self._find_row(first['rows'], login) is not None:
+            found = guess, first
+        elif first is not None or guess != 1:
+            if first is None:  # the contest has fewer pages now
+                first = self._get_standings_page(1)
+            pages = first['pages'] if first is not None else 0
+            order = sorted((p for p in range(1, pages + 1) if p != guess), key=lambda p: (abs(p - guess), p))
+            def check(p):
+                data = self._get_standings_page(p)
+                return data if data is not None and self._find_row(data['rows'], login) is not None else None
+            for i in range(0, len(order), jobs):
+                batch = order[i:i + jobs]
+                results = [(p, data) for p, data in zip(batch, pool.map(check, batch)) if data is not None]
+                if results:
+                    found = results[0]
+                    break
+        page = found[0] if found is not None else None
+        if page != index.get(login):
+            with self._changing_meta() as meta:
+                index = meta.setdefault('standings_index', {})
+                if page is not None:
+                    index[login] = page
+                else:
+                    index.pop(login, None)  # another process may have removed it
+        return found
+
+    def show_participant(self, login, context=5, jobs=4):
+        self._ensure_session()
+        self._set_pool_size(jobs)
+        with ThreadPoolExecutor(jobs) as pool:
+            found = self._find_participant(login, pool, jobs)
+        if found is None:
+            print(f'{login} was not found in the leaderboard')
+            return
+        page, data = found
+        self._record_standings([data])
+        rows = data['rows']
+        pos = self._find_row(rows, login)
+        lines = format_table(rows[max(0, pos - context):pos + context + 1])
+        mark = min(pos, context)
+        print(f'Page {page}:')
+        print('\n'.join(('> ' if i == mark else '  ') + line for i, line in enumerate(lines)))
+
+    def show_leaderboard(self, page=1, all_pages=False, watch=None, jobs=4):
+        # watch: refresh interval in seconds
+        #TODO get additional info, print as a table?
+        self._ensure_session()
+        self._set_pool_size(jobs)
+        screen = LiveScreen()
+        standings = None
+        with ThreadPoolExecutor(jobs) as pool:
+            while True:
+                standings = self._get_standings(page, all_pages, pool, standings)
+                if not standings:
+                    print('No results, try another page...')
+                    return
+                rows = [row for p in sorted(standings) for row in standings[p]['rows']]
+                self._record_standings(standings.values())
+                lines = format_table(rows)
+                if watch is None:
+                    print('\n'.join(lines))
+                    return
+                screen.show(lines)
+                sleep(watch)
+
+    def _statement_meta(self, problem, html, html_hash, cid=None):
+        # sample tests and limits of a problem, they are parsed only if the statement has changed
+        saved = self._meta(cid).get('statements', {}).get(problem)
+        if saved is None or saved['hash'] != html_hash:
+            saved = {'hash': html_hash, 'tests': sample_tests(html), 'limits': parse_limits(html)}
+        return dict(saved, time=time())
+
+    def _remember_statement(self, problem, html, html_hash, cid=None):
+        # saves the statement metadata to the contest metadata
+        saved = self._statement_meta(problem, html, html_hash, cid)
+        with self._changing_meta(cid) as meta:
+            meta.setdefault('statements', {})[problem] = saved
+        return saved
+
+    def _get_samples(self, problem, cid=None):
+        # returns ([(input, output)], time limit in seconds or None, memory limit in bytes or None)
+        saved = self._meta(cid).get('statements', {}).get(problem)
+        if saved is None or not self._fresh(saved['time']):
+            r = self._req_get(self._get_problem_url(problem, cid))
+            html = parse(r.text, 'div', 'problem-statement').find('div', class_='problem-statement')
+            if html is None:
+                raise YacontestError('Problem statement was not found')
+            saved = self._remember_statement(problem, html, hashlib.sha1(str(html).encode()).hexdigest(), cid)
+        return (saved['tests'], *saved['limits'])
+
+    def test_solution(self, problem, filename, jobs=None):
+        # runs the solution on sample tests, returns True if all tests have passed
+        from . import runner
+        problem = problem.lower()
+        if not os.path.isfile(filename):
+            raise YacontestError(f'File not found: {filename}')
+        tests, time_limit, memory_limit = self._get_samples(problem)
+        if not tests:
+            print('No sample tests')
+            return True
+        with runner.Program(filename) as program:
+            if not runner.build_all([program]):
+                return False
+            with ThreadPoolExecutor(jobs or os.cpu_count()) as pool:
+                results = list(pool.map(lambda test: program.run(test[0].encode(), time_limit, memory_limit), tests))
+        rows = [['Test', 'Verdict', 'Time', 'Memory']]
+        failed = []
+        for i, ((_, expected), result) in enumerate(zip(tests, results), 1):
+            verdict = runner.verdict(result, expected.encode(), time_limit, memory_limit)
+            memory = ('' if result['memory_exact'] else '<') + f'{result["memory"] / 2**20:.1f}Mb'
+            rows.append([str(i), verdict, f'{result["time"] * 1000:.0f}ms', memory])
+            if verdict != 'OK':
+                failed.append((i, verdict, result))
+        print('\n'.join(format_table(rows)))
+        for i, verdict, result in failed:
+            in_, expected = tests[i - 1]
+            print(f'{"-" * 20}\nTest {i}: {verdict}')
+            print('Input:\n' + head(in_))
+            print('Expected:\n' + head(expected))
+            print('Output:\n' + head(result['output'].decode(errors='replace')))
+            if result['stderr']:
+                print('Stderr:\n' + head(result['stderr'].decode(errors='replace')))
+        print(f'Passed {len(tests) - len(failed)}/{len(tests)}')
+        return not failed
+
+    def show_status(self, problem, report=False):
         problem = problem.lower()
         status = self._get_status(problem)
         print(status)
-        if status.ce:
-            print(self._status_details(status))
+        if report or status.ce:
+            print(self._status_details(status, tests=report))
 
-    def choose_lang(self):  # TODO refactor / remove copypaste in submit()
-        url = sorted(self._get_problems().values())[0]
-        r = self._req_get(url)
-        soup = BS(r.text, "html.parser")
-        form = soup.find_all('form')[-1]
-        for el in form.find_all('input'):
-            name = el['name']
-            if name.endswith('compiler') or name.endswith('compilerId'):
-                print('ERROR: No available languages!')
-                return
-        for el in form.find_all('select'):
-            name = el['name']
-            if name.endswith('compilerId'):
-                available = {re.sub(r"\s+", ' ', comp.text): comp['value'] for comp in el.find_all('option')}
-                compiler = choice('Select a language/compiler:', list(available.keys()))
-                if compiler is not None:
-                    self.cfg['lang'] = compiler
-                    set_cfg(self.cfg)
-                else:
-                    print('Incorrect choice, try again')
-                    sys.exit(1)
-                break
+    def choose_lang(self):
+        _, _, compilers, _ = self._get_form(min(self._get_problems()))
+        if compilers is None:
+            raise YacontestError('No available languages!')
+        self.cfg['lang'] = self._choose_compiler(compilers, None)
+        with self.store.changing(settings_record) as cfg:
+            cfg['lang'] = self.cfg['lang']
@@ -1,41 +1,124 @@
+import json
+import os
 import pickle
 import sys
+from contextlib import contextmanager
 from getpass import getpass
-from pkg_resources import resource_filename
-from shutil import copyfile
 
-from .utils import choice
+from .utils import choice, config_dir, write_atomic
 
-cfg_file = resource_filename(__name__, 'data/config')
-cfg_backup = resource_filename(__name__, 'data/config.bak')  # used for updates
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
 
+# the config of older versions, a single pickle in the package directory. It's moved to the store on first use
+legacy_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'config')
+legacy_keys = ('problems', 'forms', 'standings_index')  # caches of even older versions, not migrated
 
-def get_cfg(noexit=False):
-    def restore_backup():
+# records of the store:
+# settings.json: domain, login, password, contest, lang (and scheme for benchmarks)
+# cookies: {'jar': RequestsCookieJar, 'checked': time of the last session check}
+# contests/<id>: metadata of a contest (problems, forms, statements, standings index), see Client._meta
+settings_record = 'settings.json'
+
+
+class Store():
+    # each record is a separate file which is replaced atomically, so a change touches only its record
+    # and readers don't need a lock. Read-modify-write of a record is done under an exclusive lock,
+    # so concurrent yacontest processes don't lose each other's changes
+    def __init__(self, dirname=None):
+        self.dirname = dirname or config_dir()
+
+    def path(self, name):
+        return os.path.join(self.dirname, name)
+
+    @contextmanager
+    def lock(self):
+        os.makedirs(self.dirname, mode=0o700, exist_ok=True)  # the password and cookies are stored here
+        with open(self.path('.lock'), 'a') as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            else:
+                f.seek(0)
+                while True:
+                    try:
+                        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)  # gives up after 10 seconds
+                        break
+                    except OSError:
+                        pass
+            yield  # released when the file is closed
+
+    def load(self, name, default=None):
         try:
-            with open(cfg_backup, 'rb') as f:
+            with open(self.path(name), 'rb') as f:
                 data = f.read()
         except FileNotFoundError:
-            data = b''
-        if data != b'':
-             copyfile(cfg_backup, cfg_file)
-        return data
-
-    with open(cfg_file, 'rb') as f:
-        data = f.read() or restore_backup()
-    if data == b'':
+            return default
+        return json.loads(data.decode()) if name.endswith('.json') else pickle.loads(data)
+
+    def _write(self, name, value):
+        path = self.path(name)
+        os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+        data = json.dumps(value, indent=1).encode() if name.endswith('.json') else pickle.dumps(value)
+        write_atomic(path, data, 0o600)
+
+    def save(self, name, value):
+        with self.lock():
+            self._write(name, value)
+
+    @contextmanager
+    def changing(self, name, default=None):
+        # with store.changing(name, {}) as value: value[key] = ... -- the record is reloaded under the lock
+        # and saved if the block has finished without errors
+        with self.lock():
+            value = self.load(name, default)
+            yield value
+            self._write(name, value)
+
+
+def _migrate(store):
+    # returns the settings from the legacy config or None if there is no legacy config
+    for path in (legacy_file, legacy_file + '.bak'):
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            continue
+        if data:
+            break
+    else:
+        return None
+    cfg = pickle.loads(data)
+    for key in legacy_keys:
+        cfg.pop(key, None)
+    if cfg.get('cookies') is not None:
+        store.save('cookies', {'jar': cfg['cookies'], 'checked': cfg.get('session_checked', 0)})
+    for cid, meta in cfg.get('contests', {}).items():
+        store.save(f'contests/{cid}', meta)
+    for key in ('cookies', 'session_checked', 'contests'):
+        cfg.pop(key, None)
+    store.save(settings_record, cfg)
+    return cfg
+
+
+def get_cfg(noexit=False):
+    # the settings
+    store = Store()
+    cfg = store.load(settings_record)
+    if cfg is None:
+        cfg = _migrate(store)
+    if cfg is None:
         if noexit:
             return None
         print('ERROR: Config not found, run "yacontest config" first')
         sys.exit(1)
-
-    return pickle.loads(data)
+    return cfg
 
 
 def set_cfg(cfg):
-    with open(cfg_file, 'wb') as f:
-        pickle.dump(cfg, f)
-    copyfile(cfg_file, cfg_backup)
+    Store().save(settings_record, cfg)
 
 
 def create():
@@ -59,17 +142,16 @@ def create():
 
 
 def select(contest_id):
-    cfg = get_cfg()
-    cfg['contest'] = contest_id
-    cfg.pop('problems', None)
-    set_cfg(cfg)
+    get_cfg()  # exits if there is no config
+    with Store().changing(settings_record) as cfg:
+        cfg['contest'] = contest_id
     print('Success!')
 
 def lang(name):
-    cfg = get_cfg()
-    if name is not None:
-        cfg['lang'] = name
-    else:
-        cfg.pop('lang', None)
-    set_cfg(cfg)
+    get_cfg()
+    with Store().changing(settings_record) as cfg:
+        if name is not None:
+            cfg['lang'] = name
+        else:
+            cfg.pop('lang', None)
     print('Success!')
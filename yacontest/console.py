@@ -1,9 +1,11 @@
 #!/usr/bin/env python3
 
+import os
 import sys
+from time import localtime, strftime, time
 
-from . import config
-from .client import Client
+from . import config, profiling
+from .utils import YacontestError, format_table
 
 
 def print_usage(args=None):
@@ -13,13 +15,60 @@ def print_usage(args=None):
     print('    select <contest id>  -  choose a contest')
     print('    lang "..."  -  choose/reset preferred language / compiler')
     print('    lang  -  show selected language / compiler')
-    print('    load  -  save all problem statements to ./problems/')
-    print('    send <file> <problem id>  -  upload a solution')
-    print('    check <file> <problem id> [--lang "..."]  -  upload a solution and wait for result')
-    print('    status <problem id> [--lang "..."]  -  show status of the last solution')
-    print('    leaderboard [page]  -  show current leaderboard')
-    print('    loadcode [id1,id2,...]  -  download solutions for contests with listed ids')
+    print('    load [--jobs N]  -  save all problem statements to ./problems/')
+    print('    send <file> <problem id> [<file> <problem id> ...] [--lang "..."] [--test]  -  upload solutions')
+    print('    check <file> <problem id> [<file> <problem id> ...] [--lang "..."] [--test] [--report]  -  upload solutions and wait for results')
+    print('    test <file> <problem id> [--jobs N]  -  run a solution on sample tests locally')
+    print('    stress <solution> <brute> <generator> [--jobs N] [--count N] [--problem ID]  -  compare two solutions on generated tests')
+    print('    watch <file> <problem id> [--lang "..."] [--report]  -  upload the file and wait for the result on each save')
+    print('    status <problem id> [--lang "..."] [--report]  -  show status of the last solution')
+    print('    leaderboard [page] [--all] [--watch SECONDS]  -  show current leaderboard')
+    print('    leaderboard --me | --login <login>  -  show the part of the leaderboard around a participant')
+    print('    history [login]  -  show rank history of a participant (recorded by leaderboard)')
+    print('    history --first-solves | --moved MINUTES  -  show first accepted solutions / rank changes')
+    print('    loadcode [id1,id2,...] [--jobs N]  -  download solutions for contests with listed ids')
+    print('    search <query> [--statements | --solutions] [--limit N]  -  search downloaded statements and solutions')
+    print('    daemon start|stop|status  -  keep a session in background to make send / check / status / leaderboard / load faster')
     print('    help  -  print this message')
+    print('Global options:')
+    print('    --profile[=trace.json]  -  print time spent in requests / parsing / rendering at exit, optionally save all spans')
+
+
+def _pop_option(args, name, default=None):
+    # removes "name value" from args, returns value
+    if name not in args:
+        return default
+    i = args.index(name)
+    if i + 1 == len(args):
+        print(f'ERROR: No value for {name}')
+        sys.exit(1)
+    value = args[i + 1]
+    del args[i:i + 2]
+    return value
+
+
+def _pop_flag(args, name):
+    if name not in args:
+        return False
+    args.remove(name)
+    return True
+
+
+def _pop_jobs(args, default=4):
+    jobs = _pop_option(args, '--jobs', str(default))
+    if not jobs.isnumeric() or int(jobs) == 0:
+        print('ERROR: Invalid number of jobs')
+        sys.exit(1)
+    return int(jobs)
+
+
+session = None  # set by the daemon, shared by all clients
+
+
+def _client(nocid=False):
+    # imported here, so that local commands don't have to load requests / bs4
+    from .client import Client
+    return Client(nocid, session)
 
 
 def create_config(args):
@@ -44,26 +93,36 @@ def lang(args):
         return
     choice = args[0]
     if choice == 'list':
-        Client().choose_lang()
+        _client().choose_lang()
     else:
         config.lang(choice if choice.lower() != 'reset' else None)
 
 
 def load_problems(args):
-    Client().load_problems()
+    jobs = _pop_jobs(args)
+    _client().load_problems(jobs)
 
 
 def _send(args, wait):
-    if len(args) < 2:
+    lang = _pop_option(args, '--lang')
+    jobs = _pop_jobs(args)
+    run_tests = _pop_flag(args, '--test')
+    report = _pop_flag(args, '--report')
+    if len(args) < 2 or len(args) % 2:
         print('ERROR: Not enough options, check usage')
         sys.exit(1)
-    fname, problem = args[:2]
-    if len(args) > 3 and args[2] == '--lang':
-        lang = args[3]
-    else:
-        lang = None
-    Client().submit(problem, fname, wait, lang)
-
+    solutions = [(problem, fname) for fname, problem in zip(args[::2], args[1::2])]
+    client = _client()
+    if run_tests:  # nothing is sent if some solution fails on samples
+        passed = True
+        for problem, fname in solutions:
+            if len(solutions) > 1:
+                print(f'Problem {problem}:')
+            passed = client.test_solution(problem, fname) and passed
+        if not passed:
+            print('ERROR: Sample tests have failed, nothing was sent')
+            sys.exit(1)
+    client.submit_many(solutions, wait, lang, jobs, report)
 
 
 def check(args):
@@ -74,15 +133,80 @@ def send(args):
     _send(args, False)
 
 
+def test(args):
+    jobs = _pop_option(args, '--jobs')
+    if jobs is not None and (not jobs.isnumeric() or int(jobs) == 0):
+        print('ERROR: Invalid number of jobs')
+        sys.exit(1)
+    if len(args) < 2:
+        print('ERROR: Not enough options, check usage')
+        sys.exit(1)
+    if not _client().test_solution(args[1], args[0], jobs and int(jobs)):
+        sys.exit(1)
+
+
+def stress(args):
+    from . import runner
+    jobs = _pop_jobs(args, os.cpu_count())
+    count = _pop_option(args, '--count')
+    if count is not None and not count.isnumeric():
+        print('ERROR: Invalid number of tests')
+        sys.exit(1)
+    problem = _pop_option(args, '--problem')
+    if len(args) < 3:
+        print('ERROR: Not enough options, check usage')
+        sys.exit(1)
+    for fname in args[:3]:
+        if not os.path.isfile(fname):
+            print(f'ERROR: File not found: {fname}')
+            sys.exit(1)
+    if problem is None:  # a.cpp -> problem a
+        problem = os.path.splitext(os.path.basename(args[0]))[0]
+    fail_path = os.path.join('problems', f'{problem.lower()}.fail.txt')
+    if not runner.stress(*args[:3], fail_path, jobs, count and int(count)):
+        sys.exit(1)
+
+
+def watch(args):
+    lang = _pop_option(args, '--lang')
+    report = _pop_flag(args, '--report')
+    if len(args) < 2:
+        print('ERROR: Not enough options, check usage')
+        sys.exit(1)
+    try:
+        _client().watch(args[1], args[0], lang, report=report)
+    except KeyboardInterrupt:  # the only way to stop watching
+        pass
+
+
 def status(args):
+    report = _pop_flag(args, '--report')
     if not args:
         print('ERROR: Problem id is not specified')
         sys.exit(1)
     problem = args[0]
-    Client().show_status(problem)
+    _client().show_status(problem, report)
 
 
 def leaderboard(args):
+    login = _pop_option(args, '--login')
+    if _pop_flag(args, '--me'):
+        login = config.get_cfg()['login']
+    if login is not None:
+        jobs = _pop_jobs(args)
+        _client().show_participant(login, jobs=jobs)
+        return
+    all_pages = _pop_flag(args, '--all')
+    watch = _pop_option(args, '--watch')
+    if watch is not None:
+        try:
+            watch = float(watch)
+        except ValueError:
+            watch = -1
+        if watch <= 0:
+            print('ERROR: Invalid refresh interval')
+            sys.exit(1)
+    jobs = _pop_jobs(args)
     if not args:
         page = '1'
     else:
@@ -90,37 +214,159 @@ def leaderboard(args):
         if not page.isnumeric():
             print('ERROR: Invalid page number')
             sys.exit(1)
-    Client().show_leaderboard(int(page))
+    try:
+        _client().show_leaderboard(int(page), all_pages, watch, jobs)
+    except KeyboardInterrupt:  # the only way to stop --watch
+        pass
+
+
+def history(args):
+    from .history import History, format_contest_time
+    cfg = config.get_cfg()
+    contest = cfg['contest']
+    moved = _pop_option(args, '--moved')
+    first_solves = _pop_flag(args, '--first-solves')
+    store = History()
+    def fmt_time(t):
+        return strftime('%Y-%m-%d %H:%M:%S', localtime(t))
+
+    if first_solves:
+        rows = [[problem, format_contest_time(at) if at is not None else fmt_time(t), name]
+                for problem, at, t, name in store.first_solves(contest)]
+        print('\n'.join(format_table(rows)) if rows else 'No accepted solutions found')
+    elif moved is not None:
+        if not moved.isnumeric():
+            print('ERROR: Invalid number of minutes')
+            sys.exit(1)
+        rows = [[name, old, '->', new] for name, old, new in store.moved(contest, time() - 60 * int(moved))]
+        print('\n'.join(format_table(rows)) if rows else 'Nobody has moved')
+    else:
+        login = args[0] if args else cfg['login']
+        names = store.find(contest, login)
+        if not names:
+            print(f'No history for {login}, run "yacontest leaderboard" to record it')
+        for name in names:
+            print(f'{name}:')
+            rows = [[fmt_time(t), rank, score, penalty] for t, rank, score, penalty in store.trajectory(contest, name)]
+            print('\n'.join(format_table(rows)))
+    store.close()
+
 
 def load_code(args):
+    jobs = _pop_jobs(args)
     if args:
         cids = [e.strip() for e in args[0].split(',')]
         if not all(cid.isnumeric() for cid in cids):
             print('ERROR: Invalid contest ID')
             sys.exit(0)
-        Client(nocid=True).load_code(cids)
+        _client(nocid=True).load_code(cids, jobs)
+    else:
+        _client().load_code(jobs=jobs)
+
+
+def search(args):
+    from .search import SearchIndex
+    kind = 'statement' if _pop_flag(args, '--statements') else 'solution' if _pop_flag(args, '--solutions') else None
+    limit = _pop_option(args, '--limit', '20')
+    if not limit.isnumeric():
+        print('ERROR: Invalid limit')
+        sys.exit(1)
+    if not args:
+        print('ERROR: No query')
+        sys.exit(1)
+    index = SearchIndex()
+    for name in ('problems', 'solutions'):  # directories created by older versions aren't registered
+        if os.path.isdir(name):
+            index.add_root(name, name)
+    start = time()
+    indexed = index.update()
+    if indexed:
+        print(f'Indexed {indexed} new or changed files')
+    results = index.search(' '.join(args), kind, int(limit))
+    elapsed = time() - start
+    index.close()
+    if not results:
+        print('Nothing found')
+        return
+    cwd = os.getcwd()
+    rows = []
+    for _, contest, problem, path, snippet in results:
+        if path.startswith(cwd + os.sep):
+            path = os.path.relpath(path)
+        rows.append([str(contest or ''), problem, path, ' '.join(snippet.split())])
+    print('\n'.join(format_table([['Contest', 'Problem', 'File', 'Match']] + rows)))
+    print(f'{len(results)} results in {elapsed * 1000:.0f} ms')
+
+
+def _setup_profiling(args):
+    # --profile[=trace.json] or YACONTEST_TRACE=1 / YACONTEST_TRACE=trace.json
+    trace = os.environ.get('YACONTEST_TRACE')
+    for arg in args[:]:
+        if arg == '--profile' or arg.startswith('--profile='):
+            args.remove(arg)
+            trace = arg.partition('=')[2] or '1'
+    if trace and trace != '0':
+        profiling.enable(True, trace if trace != '1' else None)
+
+
+def daemon(args):
+    from . import daemon
+    action = args[0] if args else 'status'
+    if action == 'start':
+        daemon.start()
+    elif action == 'stop':
+        daemon.stop()
+    elif action == 'status':
+        print('Running' if daemon.running() else 'Not running')
+    elif action == 'run':  # in foreground
+        daemon.serve()
     else:
-        Client().load_code()
+        print('ERROR: Unknown action, use start / stop / status / run')
+        sys.exit(1)
+
+
+cmds = {
+        'config': create_config,
+        'select': select,
+        'lang': lang,
+        'load': load_problems,
+        'send': send,
+        'check': check,
+        'watch': watch,
+        'test': test,
+        'stress': stress,
+        'status': status,
+        'leaderboard': leaderboard,
+        'help': print_usage,
+        'loadcode': load_code,
+        'history': history,
+        'search': search,
+        'daemon': daemon
+       }
+
+
+def run(args):
+    # args: command and its options
+    try:
+        cmds[args[0]](args[1:])
+    except YacontestError as e:
+        print('ERROR:', e)
+        sys.exit(1)
 
 
 def main():
-    cmds = {
-            'config': create_config,
-            'select': select,
-            'lang': lang,
-            'load': load_problems,
-            'send': send,
-            'check': check,
-            'status': status,
-            'leaderboard': leaderboard,
-            'help': print_usage,
-            'loadcode': load_code
-           }
     args = sys.argv
+    _setup_profiling(args)
     if len(args) == 1 or args[1] not in cmds:
         print_usage()
         sys.exit(1)
-    cmds[args[1]](args[2:])
+    if profiling.spans is None and os.environ.get('YACONTEST_NO_DAEMON') is None:
+        from .daemon import commands, forward
+        if args[1] in commands:
+            code = forward(args[1:])
+            if code is not None:
+                sys.exit(code)
+    run(args[1:])
 
 
 if __name__ == '__main__':
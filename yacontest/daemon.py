@@ -0,0 +1,236 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import traceback
+
+from .utils import cache_dir
+
+# commands which are sent to the daemon if it's running, others are always executed in-process
+# the daemon executes one command at a time, so commands which wait for a long time (check, leaderboard --watch)
+# are executed in-process, otherwise they would block all other commands
+commands = {'send', 'status', 'leaderboard', 'load', 'loadcode'}
+long_options = {'--watch'}
+accept_timeout = 1  # seconds, if the daemon is busy with another command for longer, the command is executed in-process
+# settings which are read when the daemon starts (by its Session or the parser), a command is executed in-process
+# if they are different. Other YACONTEST_* and XDG_* variables are passed to the daemon with the command
+fixed_settings = ('YACONTEST_RATE', 'YACONTEST_BURST', 'YACONTEST_RETRIES', 'YACONTEST_TIMEOUT', 'YACONTEST_POOL_SIZE',
+                  'YACONTEST_PARSER')
+
+
+def socket_path():
+    base = os.environ.get('XDG_RUNTIME_DIR') or cache_dir()
+    return os.path.join(base, 'yacontest.sock')
+
+
+def _connect():
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path())
+    except OSError:
+        sock.close()
+        return None
+    return sock
+
+
+def _send(sock, msg):
+    sock.sendall(json.dumps(msg).encode() + b'\n')
+
+
+def _forwarded_env(env):
+    return {k: v for k, v in env.items() if k.startswith('YACONTEST_') or k.startswith('XDG_')}
+
+
+def forward(argv):
+    # runs a command in the daemon, returns its exit code or None if it must be executed in-process
+    if argv[0] not in commands or long_options & set(argv):
+        return None
+    path = socket_path()
+    if not os.path.exists(path):
+        return None
+    sock = _connect()
+    if sock is None:
+        return None
+    size = os.get_terminal_size() if sys.stdout.isatty() else None
+    with sock, sock.makefile('rb') as replies:
+        sock.settimeout(accept_timeout)
+        try:  # the daemon sends "ready" when it takes the command
+            if not replies.readline():
+                return None
+        except OSError:  # busy
+            return None
+        sock.settimeout(None)
+        _send(sock, {'argv': argv, 'cwd': os.getcwd(), 'tty': size is not None, 'env': _forwarded_env(os.environ),
+                     'size': [size.columns, size.lines] if size is not None else None})
+        for line in replies:
+            reply = json.loads(line)
+            if 'out' in reply:
+                sys.stdout.write(reply['out'])
+                sys.stdout.flush()
+            elif 'exit' in reply:
+                return reply['exit']
+            elif 'fallback' in reply:
+                return None
+    return None  # the daemon has died
+
+
+class NeedsTerminal(Exception):
+    pass
+
+
+class ClientGone(Exception):
+    pass
+
+
+class _Input():
+    # the daemon has no terminal, commands which ask something are executed in-process
+    def readline(self, *args):
+        raise NeedsTerminal()
+
+    read = readline
+
+    def isatty(self):
+        return False
+
+
+class _Output():
+    def __init__(self, sock, tty):
+        self.sock = sock
+        self.tty = tty
+
+    def write(self, text):
+        if text:
+            try:
+                _send(self.sock, {'out': text})
+            except OSError:  # other OSErrors (e.g. network errors) are errors of the command
+                raise ClientGone() from None
+        return len(text)
+
+    def flush(self):
+        pass
+
+    def isatty(self):
+        return self.tty
+
+
+def _handle(sock, session, base_env):
+    # base_env: the environment of the daemon, restored after each command
+    from . import console
+    try:
+        _send(sock, {'ready': True})
+        with sock.makefile('rb') as requests:
+            line = requests.readline()
+    except OSError:
+        return True
+    if not line:  # just a check that the daemon is running (or the client has stopped waiting)
+        return True
+    request = json.loads(line)
+    if request.get('stop'):
+        _send(sock, {'exit': 0})
+        return False
+    env = request.get('env', {})
+    if any(env.get(k) != base_env.get(k) for k in fixed_settings):
+        _send(sock, {'fallback': True})
+        return True
+    os.chdir(request['cwd'])
+    for k in _forwarded_env(os.environ):
+        del os.environ[k]
+    os.environ.update(env)  # config / cache directories, other settings
+    if request['size'] is not None:  # used by shutil.get_terminal_size
+        os.environ['COLUMNS'], os.environ['LINES'] = map(str, request['size'])
+    stdout, stdin = sys.stdout, sys.stdin
+    sys.stdout, sys.stdin = _Output(sock, request['tty']), _Input()
+    console.session = session
+    session.uploaded = False
+    code = 0
+    try:
+        console.run(request['argv'])
+    except SystemExit as e:
+        code = e.code if isinstance(e.code, int) else int(e.code is not None)
+    except NeedsTerminal:
+        code = None
+        if session.uploaded:  # the command can't be repeated in-process, solutions would be sent twice
+            sys.stdout.write('ERROR: The command needs to ask something, but some solutions are already sent. '
+                             'Send the rest with YACONTEST_NO_DAEMON=1\n')
+            code = 1
+    except ClientGone:
+        return True
+    except Exception:  # not a fallback: the command may have already sent something
+        sys.stdout.write(traceback.format_exc())
+        code = 1
+    finally:
+        sys.stdout, sys.stdin = stdout, stdin
+        os.environ.clear()
+        os.environ.update(base_env)
+    try:
+        _send(sock, {'exit': code} if code is not None else {'fallback': True})
+    except OSError:
+        pass
+    return True
+
+
+def serve():
+    # handles one command at a time, stdout / cwd are global
+    from .transport import Session
+    session = Session()  # keeps connections (and TLS sessions) alive between commands
+    path = socket_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if os.path.exists(path):
+        os.unlink(path)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    old_umask = os.umask(0o177)  # only the owner can connect
+    try:
+        server.bind(path)
+    finally:
+        os.umask(old_umask)
+    server.listen()
+    base_env = dict(os.environ)
+    running = True
+    try:
+        while running:
+            sock, _ = server.accept()
+            with sock:
+                try:
+                    running = _handle(sock, session, base_env)
+                except Exception:
+                    traceback.print_exc()
+    finally:
+        server.close()
+        os.unlink(path)
+
+
+def running():
+    sock = _connect()
+    if sock is None:
+        return False
+    sock.close()
+    return True
+
+
+def start():
+    if running():
+        print('Daemon is already running')
+        return
+    os.makedirs(cache_dir(), exist_ok=True)
+    log = open(os.path.join(cache_dir(), 'daemon.log'), 'ab')
+    # new session: no controlling terminal, so getpass() can't ask for a password there
+    subprocess.Popen([sys.executable, '-m', 'yacontest.daemon'], stdin=subprocess.DEVNULL, stdout=log, stderr=log,
+                     start_new_session=True, cwd='/')
+    print('Started')
+
+
+def stop():
+    sock = _connect()
+    if sock is None:
+        print('Daemon is not running')
+        return
+    with sock, sock.makefile('rb') as replies:
+        replies.readline()  # ready
+        _send(sock, {'stop': True})
+        replies.readline()
+    print('Stopped')
+
+
+if __name__ == '__main__':
+    serve()
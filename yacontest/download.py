@@ -0,0 +1,151 @@
+import hashlib
+import mimetypes
+import os
+import re
+import shutil
+import threading
+from types import SimpleNamespace
+from urllib.parse import unquote, urlparse
+
+from .profiling import span, url_class
+from .transport import _setting
+from .utils import YacontestError
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+FICLONE = 0x40049409  # ioctl which makes a reflink (a copy which shares data with the original until it's changed)
+
+def _unlink(path):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def _copy(src, dst):
+    # dst is replaced atomically, a reflink is tried first (Linux, e.g. btrfs / xfs), then a usual copy
+    dirname, name = os.path.split(dst)
+    tmp = os.path.join(dirname, f'.{name}.{os.getpid()}.{threading.get_ident()}.tmp')
+    try:
+        with open(src, 'rb') as f, open(tmp, 'wb') as out:
+            try:
+                fcntl.ioctl(out.fileno(), FICLONE, f.fileno())
+            except (AttributeError, OSError):  # no fcntl (Windows) or no reflinks
+                shutil.copyfileobj(f, out, Downloader.chunk_size)
+        os.replace(tmp, dst)
+    except BaseException:
+        _unlink(tmp)
+        raise
+
+
+def disposition_name(headers):
+    # file name from the Content-Disposition header or None
+    m = re.search(r'filename\*?=(?:[\w-]+\'[\w-]*\')?"?([^";]+)', headers.get('Content-Disposition', ''), re.I)
+    return unquote(m.group(1)).strip() if m else None
+
+
+def file_name(r):
+    # a safe file name for a downloaded file: from Content-Disposition or the URL. Names which may be the same
+    # for different files (e.g. "/statement-image?id=1") get a part of the URL hash
+    name = disposition_name(r.headers)
+    if name is None:
+        url = urlparse(r.url)
+        name = unquote(os.path.basename(url.path.rstrip('/'))) or 'file'
+        stem, ext = os.path.splitext(name)
+        if url.query or not ext:
+            ext = ext or mimetypes.guess_extension(r.headers.get('Content-Type', '').split(';')[0].strip()) or ''
+            name = f'{stem}-{hashlib.sha1(r.url.encode()).hexdigest()[:8]}{ext}'
+    name = os.path.basename(name.replace('\\', '/')).lstrip('.')
+    return name or 'file'
+
+
+class ByteBudget():
+    # a semaphore counting bytes, a request larger than the budget is allowed if nothing else is in progress
+    def __init__(self, size):
+        self.size = size
+        self.used = 0
+        self.cond = threading.Condition()
+
+    def acquire(self, n):
+        with self.cond:
+            while self.used and self.used + n > self.size:
+                self.cond.wait()
+            self.used += n
+
+    def release(self, n):
+        with self.cond:
+            self.used -= n
+            self.cond.notify_all()
+
+
+class Downloader():
+    # streams files to disk: chunks are written to a temporary file which is renamed when it's complete.
+    # Each URL is downloaded once per run and identical files are stored once, as <blob_dir>/<sha256>; the files
+    # in the user's directories are copies of them (reflinks if the file system supports them), so editing one
+    # doesn't change the others. Downloads may run in several threads, the total size of downloads in progress
+    # is limited by YACONTEST_DOWNLOAD_BUDGET
+    chunk_size = 64 * 2**10
+    unknown_size = 2**20  # reserved from the budget if the server hasn't sent Content-Length
+
+    def __init__(self, get, blob_dir, budget=None):
+        # get(url): a streamed (stream=True) GET response
+        self.get = get
+        self.blob_dir = blob_dir
+        self.budget = ByteBudget(budget or _setting('YACONTEST_DOWNLOAD_BUDGET', 32 * 2**20, int))
+        self._lock = threading.Lock()
+        self._urls = {}  # {url: [lock, (blob, response without content) or None]}
+        self._used = set()  # blobs of this run, others are removed by cleanup
+
+    def download(self, url, dirname, name=file_name):
+        # returns the file name, name: a file name or a function (response -> file name)
+        with self._lock:
+            entry = self._urls.setdefault(url, [threading.Lock(), None])
+        with entry[0]:  # the same URL isn't downloaded by several threads at once
+            if entry[1] is None or not os.path.exists(entry[1][0]):
+                entry[1] = self._fetch(url)
+            blob, r = entry[1]
+        name = name(r) if callable(name) else name
+        _copy(blob, os.path.join(dirname, name))
+        return name
+
+    def _fetch(self, url):
+        # returns (blob, response without content)
+        r = self.get(url)
+        with r:
+            if r.status_code != 200:
+                raise YacontestError(f'Can\'t download {url}: HTTP {r.status_code}')
+            size = int(r.headers.get('Content-Length') or 0) or Downloader.unknown_size
+            os.makedirs(self.blob_dir, exist_ok=True)
+            tmp = os.path.join(self.blob_dir, f'.{os.getpid()}.{threading.get_ident()}.tmp')
+            digest = hashlib.sha256()
+            self.budget.acquire(size)
+            try:
+                with span('download', url_class(url)) as s, open(tmp, 'wb') as f:
+                    for chunk in r.iter_content(Downloader.chunk_size):
+                        f.write(chunk)
+                        digest.update(chunk)
+                    s.set(bytes=f.tell())
+                blob = os.path.join(self.blob_dir, digest.hexdigest())
+                with self._lock:
+                    os.replace(tmp, blob)  # an identical blob is replaced by the same content
+                    self._used.add(blob)
+            except BaseException:
+                _unlink(tmp)
+                raise
+            finally:
+                self.budget.release(size)
+        return blob, SimpleNamespace(url=r.url, headers=r.headers, status_code=r.status_code)
+
+    def cleanup(self):
+        # removes stored files which weren't used by this run
+        try:
+            names = os.listdir(self.blob_dir)
+        except FileNotFoundError:
+            return
+        for name in names:
+            path = os.path.join(self.blob_dir, name)
+            if path not in self._used:
+                _unlink(path)
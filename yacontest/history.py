@@ -0,0 +1,117 @@
+import os
+import re
+import sqlite3
+from time import time
+
+from .utils import data_dir
+
+# Snapshots are delta-encoded: a rank / result row is stored only if it differs from the previous one
+# for the same participant (and problem), the latest values are kept in latest_* tables.
+# solves: the first accepted result of a participant for a problem, "at" is the acceptance time shown in the standings
+# (seconds from the start of the contest), "time" is the time of the snapshot where it has appeared
+schema = '''
+create table if not exists snapshots (id integer primary key, contest integer, time real);
+create table if not exists participants (id integer primary key, contest integer, name text, unique (contest, name));
+create table if not exists ranks (snapshot integer, participant integer, rank text, score text, penalty text);
+create index if not exists ranks_participant on ranks (participant, snapshot);
+create table if not exists results (snapshot integer, participant integer, problem text, result text);
+create index if not exists results_problem on results (problem, snapshot);
+create index if not exists results_participant on results (participant, snapshot);
+create table if not exists latest_ranks (participant integer primary key, rank text, score text, penalty text);
+create table if not exists latest_results (participant integer, problem text, result text, primary key (participant, problem));
+create table if not exists solves (participant integer, problem text, at integer, time real, primary key (participant, problem));
+'''
+
+
+def contest_time(text):
+    # "h:mm" or "h:mm:ss" -> seconds, None if there is no time
+    m = re.search(r'(\d+):(\d\d)(?::(\d\d))?', text or '')
+    if m is None:
+        return None
+    return int(m.group(1)) * 3600 + int(m.group(2)) * 60 + int(m.group(3) or 0)
+
+
+def format_contest_time(seconds):
+    return f'{seconds // 3600}:{seconds // 60 % 60:02}:{seconds % 60:02}'
+
+
+class History():
+    # local store of leaderboard snapshots
+    def __init__(self, path=None):
+        if path is None:
+            os.makedirs(data_dir(), exist_ok=True)
+            path = os.path.join(data_dir(), 'history.sqlite')
+        self.db = sqlite3.connect(path)
+        self.db.executescript(schema)
+
+    def close(self):
+        self.db.close()
+
+    def _participant(self, contest, name):
+        self.db.execute('insert or ignore into participants (contest, name) values (?, ?)', (contest, name))
+        return self.db.execute('select id from participants where contest = ? and name = ?', (contest, name)).fetchone()[0]
+
+    def record(self, contest, problems, rows, times=None):
+        # rows: [[rank, name, *results, score, penalty]] as shown by the leaderboard
+        # times: [[acceptance time or None for each problem]] for the rows, see contest_time
+        snapshot = None
+        times = times or [[]] * len(rows)
+        with self.db:
+            for row, row_times in zip(rows, times):
+                rank, name = row[0].strip(), row[1].strip()
+                results = [e.strip() for e in row[2:2 + len(problems)]]
+                totals = [e.strip() for e in row[2 + len(problems):]] + ['', '']
+                pid = self._participant(contest, name)
+                new_rank = (rank, totals[0], totals[1])
+                old_rank = self.db.execute('select rank, score, penalty from latest_ranks where participant = ?', (pid,)).fetchone()
+                old_results = dict(self.db.execute('select problem, result from latest_results where participant = ?', (pid,)))
+                changed_results = [(problem, result) for problem, result in zip(problems, results) if old_results.get(problem) != result]
+                if old_rank == new_rank and not changed_results:
+                    continue
+                if snapshot is None:
+                    snapshot = self.db.execute('insert into snapshots (contest, time) values (?, ?)', (contest, time())).lastrowid
+                if old_rank != new_rank:
+                    self.db.execute('insert into ranks values (?, ?, ?, ?, ?)', (snapshot, pid, *new_rank))
+                    self.db.execute('insert or replace into latest_ranks values (?, ?, ?, ?)', (pid, *new_rank))
+                for problem, result in changed_results:
+                    self.db.execute('insert into results values (?, ?, ?, ?)', (snapshot, pid, problem, result))
+                    self.db.execute('insert or replace into latest_results values (?, ?, ?)', (pid, problem, result))
+                    at = contest_time(dict(zip(problems, row_times)).get(problem))
+                    # without the acceptance time, a result which was there before the first snapshot
+                    # of the participant isn't a solve observed by us
+                    if result.startswith('+') and (at is not None or old_rank is not None):
+                        self.db.execute('insert or ignore into solves values (?, ?, ?, ?)', (pid, problem, at, time()))
+
+    def find(self, contest, login):
+        # participants whose name contains the login
+        return [name for name, in self.db.execute(
+            "select name from participants where contest = ? and name like ? escape '\\' order by name",
+            (contest, '%' + login.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'))]
+
+    def trajectory(self, contest, name):
+        # [(time, rank, score, penalty)]
+        return self.db.execute('''select s.time, r.rank, r.score, r.penalty from ranks r
+                                  join snapshots s on s.id = r.snapshot
+                                  join participants p on p.id = r.participant
+                                  where p.contest = ? and p.name = ? order by r.snapshot''', (contest, name)).fetchall()
+
+    def first_solves(self, contest):
+        # [(problem, at, time, name)], the earliest solve by the acceptance time ("at") if the standings show it,
+        # otherwise by the time of the snapshot where it has appeared
+        rows = self.db.execute('''select s.problem, s.at, s.time, p.name from solves s
+                                  join participants p on p.id = s.participant
+                                  where p.contest = ? order by s.at is null, s.at, s.time, p.name''', (contest,))
+        first = {}
+        for problem, at, t, name in rows:
+            first.setdefault(problem, (problem, at, t, name))
+        return sorted(first.values())
+
+    def moved(self, contest, since):
+        # [(name, rank at the time "since", current rank)] for participants whose rank has changed
+        rows = self.db.execute('''select p.name,
+                                      (select r.rank from ranks r join snapshots s on s.id = r.snapshot
+                                       where r.participant = p.id and s.time <= ? order by r.snapshot desc limit 1),
+                                      l.rank
+                                  from participants p join latest_ranks l on l.participant = p.id
+                                  where p.contest = ?''', (since, contest))
+        return [row for row in rows if row[1] is not None and row[1] != row[2]]
@@ -0,0 +1,42 @@
+import os
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+from .profiling import span
+
+
+def _pick_parser():
+    # lxml is much faster than the pure-python parser, use it if it's installed
+    forced = os.environ.get('YACONTEST_PARSER')
+    if forced:
+        return forced
+    try:
+        import lxml  # noqa: F401
+        return 'lxml'
+    except ImportError:
+        return 'html.parser'
+
+
+parser = _pick_parser()
+
+
+def _has_class(name):
+    # the strainer gets raw attribute values, so "a b" doesn't match class_="b" without this
+    def match(value):
+        if value is None:
+            return False
+        if isinstance(value, str):
+            value = value.split()
+        return name in value
+    return match
+
+
+def parse(markup, name=None, class_=None, backend=None):
+    # builds a tree only for tags matching (name, class_) and their contents, whole document if both are None
+    only = None
+    if class_ is not None:
+        only = SoupStrainer(name, class_=_has_class(class_))
+    elif name is not None:
+        only = SoupStrainer(name)
+    with span('parse', name or class_ or 'document', bytes=len(markup), backend=backend or parser):
+        return BeautifulSoup(markup, backend or parser, parse_only=only)
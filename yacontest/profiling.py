@@ -0,0 +1,80 @@
+import atexit
+import json
+import re
+import sys
+import threading
+from time import perf_counter, time
+
+spans = None  # recorded spans (dicts), None if profiling is disabled
+_lock = threading.Lock()
+_start = perf_counter()
+
+
+def enable(summary=True, trace_file=None):
+    # summary: print a table to stderr at exit, trace_file: also save all spans there as JSON
+    global spans
+    if spans is None:
+        spans = []
+        atexit.register(_finish, summary, trace_file)
+
+
+def url_class(url):
+    # "https://host/contest/123/problems/A/?ajax=submit-table" -> "/contest/<id>/problems/<problem>/?ajax"
+    path, _, query = re.sub(r'^\w+://[^/]+', '', url).partition('?')
+    path = re.sub(r'/\d+(?=/|$)', '/<id>', path)
+    path = re.sub(r'/problems/[^/]+/', '/problems/<problem>/', path)
+    keys = sorted(set(re.findall(r'(?:^|&)([^=&]+)', query)))
+    return path + ('?' + '&'.join(keys) if keys else '')
+
+
+class span():
+    # with span('parse', 'table', bytes=...) as s: ...; s.set(status=...)
+    def __init__(self, kind, name, **attrs):
+        self.kind = kind
+        self.name = name
+        self.attrs = attrs
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        self.begin = perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if spans is None:
+            return
+        record = {'kind': self.kind, 'name': self.name, 'start': self.begin - _start,
+                  'elapsed': perf_counter() - self.begin, 'thread': threading.get_ident()}
+        record.update(self.attrs)
+        if exc_type is not None:
+            record['error'] = exc_type.__name__
+        with _lock:
+            spans.append(record)
+
+
+def _summary():
+    groups = {}
+    for s in spans:
+        g = groups.setdefault((s['kind'], s['name']), {'count': 0, 'total': 0, 'max': 0, 'bytes': 0, 'new_connections': 0})
+        g['count'] += 1
+        g['total'] += s['elapsed']
+        g['max'] = max(g['max'], s['elapsed'])
+        g['bytes'] += s.get('bytes', 0)
+        g['new_connections'] += s.get('new_connections', 0)
+    rows = [['kind', 'name', 'count', 'total, ms', 'mean, ms', 'max, ms', 'KiB', 'new conns']]
+    for (kind, name), g in sorted(groups.items(), key=lambda e: -e[1]['total']):
+        rows.append([kind, name, str(g['count']), f'{g["total"] * 1000:.1f}', f'{g["total"] / g["count"] * 1000:.1f}',
+                     f'{g["max"] * 1000:.1f}', f'{g["bytes"] / 1024:.1f}', str(g['new_connections']) if kind == 'http' else ''])
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+    lines = ['  '.join(cell.ljust(w) if i < 2 else cell.rjust(w) for i, (cell, w) in enumerate(zip(row, widths))) for row in rows]
+    lines.append(f'wall time: {(perf_counter() - _start) * 1000:.1f} ms')
+    return '\n'.join(lines)
+
+
+def _finish(summary, trace_file):
+    if summary:
+        print(_summary(), file=sys.stderr)
+    if trace_file:
+        with open(trace_file, 'w') as f:
+            json.dump({'argv': sys.argv, 'time': time(), 'spans': spans}, f, indent=1)
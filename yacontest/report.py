@@ -0,0 +1,112 @@
+from html.parser import HTMLParser
+
+from .utils import format_table, head
+
+# column titles of the tests table -> keys of test dicts, other columns are kept with their titles
+columns = {'тест': 'test', 'test': 'test', 'вердикт': 'verdict', 'verdict': 'verdict', 'время': 'time', 'time': 'time',
+           'память': 'memory', 'memory': 'memory', 'баллы': 'score', 'score': 'score',
+           'вывод чекера': 'checker', 'checker output': 'checker', 'комментарий': 'checker', 'comment': 'checker'}
+max_log_size = 64 * 2**10  # characters of a <pre> block which are kept
+headings = {'h1', 'h2', 'h3', 'h4', 'h5', 'h6'}
+
+
+class ReportParser(HTMLParser):
+    # parses a run report incrementally: p.feed(chunk); ...; p.close(); p.report()
+    # only the tests table and <pre> blocks (compilation log, checker output) are kept,
+    # so memory use doesn't depend on the size of the page
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.tests = []
+        self.logs = []  # [(title, text)]
+        self.heading = ''  # the last heading, title of the following <pre> blocks
+        self._heading = None  # text parts of the current heading
+        self._pre = None  # text parts of the current <pre>, its size
+        self._cell = None  # text parts of the current cell
+        self._row = None  # cells of the current row
+        self._header = False  # the current row has <th> cells
+        self._table = None  # None: not in a table, []: before the header, else keys of the tests table columns
+        self._tests = {}  # {test number: test}, details of a test may be in several tables
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'table':
+            self._table = []
+        elif tag == 'tr' and self._table is not None:
+            self._row = []
+            self._header = False
+        elif tag in ('td', 'th') and self._row is not None:
+            self._cell = []
+            self._header = self._header or tag == 'th'
+        elif tag == 'pre':
+            self._pre = [[], 0]
+        elif tag in headings:
+            self._heading = []
+        elif tag == 'br' and self._cell is not None:
+            self._cell.append('\n')
+
+    def handle_endtag(self, tag):
+        if tag == 'table':
+            self._table = self._row = self._cell = None
+        elif tag in ('td', 'th') and self._cell is not None:
+            self._row.append(''.join(self._cell).strip())
+            self._cell = None
+        elif tag == 'tr' and self._row is not None:
+            self._end_row()
+        elif tag == 'pre' and self._pre is not None:
+            text = ''.join(self._pre[0]).strip('\n')
+            if self._pre[1] > max_log_size:
+                text += '\n...'
+            if self._cell is None or not self._table:  # otherwise it's a part of a test row (checker output)
+                self.logs.append((self.heading, text))
+            self._pre = None
+        elif tag in headings and self._heading is not None:
+            self.heading = ' '.join(''.join(self._heading).split())
+            self._heading = None
+
+    def _end_row(self):
+        row, self._row = self._row, None
+        if self._table == []:  # the first row
+            keys = [columns.get(' '.join(title.lower().split()), title) for title in row]
+            self._table = keys if self._header and 'test' in keys and 'verdict' in keys else None  # other tables are skipped
+        elif self._table and row:
+            test = dict(zip(self._table, row))
+            if test['test'] in self._tests:
+                self._tests[test['test']].update((k, v) for k, v in test.items() if v)
+            else:
+                self._tests[test['test']] = test
+                self.tests.append(test)
+
+    def handle_data(self, data):
+        if self._pre is not None:
+            if self._pre[1] < max_log_size:
+                self._pre[0].append(data[:max_log_size - self._pre[1]])
+            self._pre[1] += len(data)
+        if self._cell is not None:
+            self._cell.append(data)
+        if self._heading is not None:
+            self._heading.append(data)
+
+    def report(self):
+        # {'tests': [{'test', 'verdict', 'time', 'memory', ('checker', 'score', ...)}], 'logs': [(title, text)]}
+        return {'tests': self.tests, 'logs': self.logs}
+
+
+def format_logs(report):
+    # <pre> blocks of a report, e.g. a compilation log
+    delim = '\n' + '-' * 20 + '\n'
+    details = [text for _, text in report['logs'] if text.strip()] or ['No description available']
+    return delim[1:] + delim.join(details) + delim[:-1]
+
+
+def format_tests(report):
+    # a table of tests, checker output of failed tests is shown below it
+    tests = report['tests']
+    if not tests:
+        return 'No tests in the report'
+    extra = sorted({key for t in tests for key in t} - {'test', 'verdict', 'time', 'memory', 'checker'})
+    keys = ['test', 'verdict', 'time', 'memory'] + extra
+    rows = [[key.capitalize() for key in keys]] + [[t.get(key, '') for key in keys] for t in tests]
+    lines = format_table(rows)
+    for t in tests:
+        if t.get('checker') and t.get('verdict') != 'OK':
+            lines.append(f'Test {t.get("test")}, {t.get("verdict")}: {head(t["checker"], 10)}')
+    return '\n'.join(lines)
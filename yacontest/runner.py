@@ -0,0 +1,283 @@
+import math
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+
+from .utils import YacontestError, head
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# extension: (compile command or None, run command)
+# {src}: source file, {exe}: file in a temporary directory, {dir}: that directory, {name}: source file name without extension
+languages = {
+    '.c': (['gcc', '-O2', '-std=c11', '{src}', '-o', '{exe}', '-lm'], ['{exe}']),
+    '.cpp': (['g++', '-O2', '-std=c++17', '{src}', '-o', '{exe}'], ['{exe}']),
+    '.cc': (['g++', '-O2', '-std=c++17', '{src}', '-o', '{exe}'], ['{exe}']),
+    '.cxx': (['g++', '-O2', '-std=c++17', '{src}', '-o', '{exe}'], ['{exe}']),
+    '.rs': (['rustc', '-O', '{src}', '-o', '{exe}'], ['{exe}']),
+    '.go': (['go', 'build', '-o', '{exe}', '{src}'], ['{exe}']),
+    '.java': (['javac', '-d', '{dir}', '{src}'], ['java', '-cp', '{dir}', '{name}']),
+    '.py': (None, [sys.executable, '{src}']),
+}
+# memory limit is checked by peak RSS, the address space is also limited (to twice the memory limit, so a solution
+# can't eat all memory of the machine) except for runtimes which reserve a lot of virtual memory (JVM, Go)
+limit_address_space = {'.c', '.cpp', '.cc', '.cxx', '.rs'}
+default_time_limit = 5  # seconds, if the statement has no limits
+
+
+def _lower_limit(kind, value):
+    # the soft limit to set, the hard one isn't changed: it may be already lower and can't be raised
+    _, hard = resource.getrlimit(kind)
+    return value if hard == resource.RLIM_INFINITY else min(value, hard)
+
+
+def _limited(cmd, cpu_limit, as_limit):
+    # the limits are set by a shell which then execs the program: preexec_fn isn't safe in a process with threads
+    limits = [f'ulimit -S -t {_lower_limit(resource.RLIMIT_CPU, cpu_limit)}']
+    if as_limit is not None:
+        limits.append(f'ulimit -S -v {_lower_limit(resource.RLIMIT_AS, as_limit) // 1024}')  # KiB
+    return ['/bin/sh', '-c', ' && '.join(limits + ['exec "$@"']), 'sh'] + cmd
+
+
+class Program():
+    # with Program('a.cpp') as p: p.build(); p.run(b'input')
+    def __init__(self, path):
+        if resource is None or not os.path.exists('/bin/sh'):  # limits are set by setrlimit, see _limited
+            raise YacontestError('Local testing is not supported on this platform')
+        self.path = os.path.abspath(path)
+        name, self.ext = os.path.splitext(os.path.basename(path))
+        if self.ext not in languages:
+            raise YacontestError(f'Don\'t know how to run {self.ext or "files without extension"}, '
+                                 f'supported: {", ".join(sorted(languages))}')
+        self.dir = tempfile.mkdtemp(prefix='yacontest-')
+        values = {'src': self.path, 'exe': os.path.join(self.dir, name), 'dir': self.dir, 'name': name}
+        build, run = languages[self.ext]
+        self.build_cmd = [arg.format(**values) for arg in build] if build is not None else None
+        self.cmd = [arg.format(**values) for arg in run]
+
+    def build(self):
+        # returns compiler output if compilation has failed, None otherwise
+        if self.build_cmd is None:
+            return None
+        try:
+            r = subprocess.run(self.build_cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        except FileNotFoundError:
+            raise YacontestError(f'{self.build_cmd[0]} is not installed') from None
+        return r.stdout.decode(errors='replace') if r.returncode != 0 else None
+
+    def run(self, data, time_limit=None, memory_limit=None, args=()):
+        # data: input (bytes), time_limit: CPU seconds, memory_limit: bytes, args: command line arguments
+        # returns {'output', 'stderr', 'code' (-signal if killed), 'time' (CPU seconds), 'wall', 'timeout',
+        #          'memory' (peak RSS, bytes), 'memory_exact'}
+        # a child inherits the peak RSS of the forked process, so if the solution has used less memory than yacontest,
+        # only an upper bound is known (memory_exact is False)
+        cpu_limit = time_limit or default_time_limit
+        as_limit = 2 * memory_limit if memory_limit is not None and self.ext in limit_address_space else None
+        rss_scale = 1 if sys.platform == 'darwin' else 1024
+        if shutil.which(self.cmd[0]) is None:  # the shell would only exit with code 127
+            raise YacontestError(f'{self.cmd[0]} is not installed')
+
+        with tempfile.TemporaryFile() as stdin, tempfile.TemporaryFile() as stdout, tempfile.TemporaryFile() as stderr:
+            stdin.write(data)
+            stdin.seek(0)
+            inherited = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * rss_scale
+            start = perf_counter()
+            proc = subprocess.Popen(_limited(self.cmd + list(args), math.ceil(cpu_limit) + 1, as_limit),
+                                    stdin=stdin, stdout=stdout, stderr=stderr)
+            lock = threading.Lock()
+            state = {'running': True, 'timeout': False}
+
+            def kill():  # a sleeping solution doesn't spend CPU time, so wall time is limited too
+                with lock:
+                    if state['running']:
+                        state['timeout'] = True
+                        os.kill(proc.pid, signal.SIGKILL)
+            timer = threading.Timer(2 * cpu_limit + 1, kill)
+            timer.start()
+            if hasattr(os, 'waitid'):
+                os.waitid(os.P_PID, proc.pid, os.WEXITED | os.WNOWAIT)  # the process isn't reaped yet, so its pid can't be reused
+                with lock:
+                    state['running'] = False
+                timer.cancel()
+                _, status, usage = os.wait4(proc.pid, 0)
+            else:  # macOS: the pid may be reused before the timer is cancelled, which is unlikely
+                _, status, usage = os.wait4(proc.pid, 0)
+                with lock:
+                    state['running'] = False
+                timer.cancel()
+            wall = perf_counter() - start
+            proc.returncode = -os.WTERMSIG(status) if os.WIFSIGNALED(status) else os.WEXITSTATUS(status)
+            stdout.seek(0)
+            stderr.seek(0)
+            memory = usage.ru_maxrss * rss_scale
+            return {'output': stdout.read(), 'stderr': stderr.read(), 'code': proc.returncode,
+                    'time': usage.ru_utime + usage.ru_stime, 'wall': wall, 'timeout': state['timeout'],
+                    'memory': memory, 'memory_exact': memory > inherited}
+
+    def close(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def same_output(expected, output):
+    # token-wise comparison, like the default checker
+    return expected.split() == output.split()
+
+
+def verdict(result, expected=None, time_limit=None, memory_limit=None):
+    # OK / WA / RE / TL / ML, expected=None: only check that the program has finished correctly
+    if result['timeout'] or result['time'] > (time_limit or default_time_limit) or result['code'] == -signal.SIGXCPU:
+        return 'TL'
+    if memory_limit is not None and result['memory_exact'] and result['memory'] > memory_limit:
+        return 'ML'
+    if result['code'] != 0:
+        return 'RE'
+    if expected is not None and not same_output(expected, result['output']):
+        return 'WA'
+    return 'OK'
+
+
+def build_all(programs):
+    # compiles programs in parallel, returns False (and prints errors) if some of them can't be compiled
+    if any(p.build_cmd is not None for p in programs):
+        print('Compiling...')
+    with ThreadPoolExecutor(len(programs)) as pool:
+        errors = list(pool.map(lambda p: p.build(), programs))
+    for program, err in zip(programs, errors):
+        if err is not None:
+            print(f'Compilation error in {os.path.basename(program.path)}')
+            print(err)
+    return all(err is None for err in errors)
+
+
+def _judge(solution, brute, data):
+    # (verdict of the solution, expected output, output), verdict is None if the brute force solution has failed
+    expected = brute.run(data)
+    if verdict(expected) != 'OK':
+        return None, expected['output'], b''
+    result = solution.run(data)
+    return verdict(result, expected['output']), expected['output'], result['output']
+
+
+def minimize(solution, brute, data):
+    # removes lines from a failing input while the solution still fails on it
+    # if the first line is the number of the following lines, it's kept and changed with them
+    lines = data.rstrip(b'\n').split(b'\n')
+    counted = len(lines) > 1 and lines[0].strip().isdigit() and int(lines[0]) == len(lines) - 1
+    if counted:
+        lines = lines[1:]
+
+    def text(lines):
+        return b'\n'.join([str(len(lines)).encode()] + lines if counted else lines) + b'\n'
+
+    def fails(lines):
+        return _judge(solution, brute, text(lines))[0] not in (None, 'OK')
+
+    chunk = len(lines) // 2
+    while chunk > 0:
+        removed = False
+        i = 0
+        while i < len(lines):
+            candidate = lines[:i] + lines[i + chunk:]
+            if candidate and fails(candidate):
+                lines = candidate
+                removed = True
+            else:
+                i += chunk
+        if not removed:
+            chunk //= 2
+    return text(lines)
+
+
+def stress(solution, brute, generator, fail_path, jobs, count=None, batch=16):
+    # fail_path: the minimized failing input, the original one is saved to <fail_path without .txt>.orig.txt
+    # runs "generator <seed>" for seeds 1, 2, ... and compares the outputs of the solution and the brute force solution
+    # on its output until the first mismatch, returns True if no mismatch was found
+    # workers take seeds by batches, so they rarely wait for each other
+    programs = []
+    try:
+        for path in (solution, brute, generator):
+            programs.append(Program(path))
+        if not build_all(programs):
+            return False
+        solution, brute, generator = programs
+        lock = threading.Lock()
+        stop = threading.Event()
+        state = {'next': 1, 'checked': 0, 'failure': None}
+
+        def check(seed):
+            gen = generator.run(b'', args=[str(seed)])
+            if verdict(gen) != 'OK':
+                raise YacontestError(f'Generator has failed on seed {seed}:\n{head(gen["stderr"].decode(errors="replace"))}')
+            result = _judge(solution, brute, gen['output'])
+            if result[0] is None:
+                raise YacontestError(f'Brute force solution has failed on seed {seed}')
+            return (seed, gen['output']) + result if result[0] != 'OK' else None
+
+        def worker():
+            while not stop.is_set():
+                with lock:
+                    first = state['next']
+                    last = first + batch if count is None else min(first + batch, count + 1)
+                    state['next'] = last
+                if first == last:
+                    return
+                for seed in range(first, last):
+                    if stop.is_set():
+                        return
+                    failure = check(seed)
+                    with lock:
+                        state['checked'] += 1
+                        if failure is not None and (state['failure'] is None or failure[0] < state['failure'][0]):
+                            state['failure'] = failure
+                    if failure is not None:
+                        stop.set()
+
+        print('Running, press Ctrl+C to stop')
+        start = perf_counter()
+        with ThreadPoolExecutor(jobs) as pool:
+            workers = [pool.submit(worker) for _ in range(jobs)]
+            try:
+                for task in workers:
+                    task.result()
+            except KeyboardInterrupt:
+                pass
+            finally:
+                stop.set()
+        elapsed = perf_counter() - start
+        print(f'Checked {state["checked"]} cases in {elapsed:.1f}s, {state["checked"] / elapsed:.1f} cases/s')
+        if state['failure'] is None:
+            return True
+        seed, data, result, _, _ = state['failure']
+        # the generator's output is saved as is, because the minimized input may be malformed
+        # (e.g. the number of lines in the first line isn't changed)
+        orig_path = os.path.splitext(fail_path)[0] + '.orig.txt'
+        os.makedirs(os.path.dirname(fail_path) or '.', exist_ok=True)
+        with open(orig_path, 'wb') as f:
+            f.write(data)
+        print(f'Seed {seed}: {result}, the input is saved to {orig_path}, minimizing it...')
+        data = minimize(solution, brute, data)
+        _, expected, output = _judge(solution, brute, data)
+        with open(fail_path, 'wb') as f:
+            f.write(data)
+        print(f'Minimized input (saved to {fail_path}, it may not follow the input format):\n' + head(data.decode(errors='replace')))
+        print('Expected:\n' + head(expected.decode(errors='replace')))
+        print('Output:\n' + head(output.decode(errors='replace')))
+        return False
+    finally:
+        for program in programs:
+            program.close()
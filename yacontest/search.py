@@ -0,0 +1,149 @@
+import json
+import os
+import re
+import sqlite3
+
+from .utils import YacontestError, data_dir
+
+# statement files (see Statement) consist of sections: title, limits, legend, specifications, notes, sample tests
+section_delim = '\n' + '=' * 20 + '\n'
+sample_marker = '>' * 10
+max_source_size = 2**20  # larger files in ./solutions are not indexed
+
+# roots: directories created by "load" (kind "problems") and "loadcode" (kind "solutions")
+# files: indexed files, a file is indexed again if its mtime or size has changed
+schema = '''
+create table if not exists roots (path text primary key, kind text, contest integer);
+create table if not exists files (path text primary key, root text, mtime integer, size integer, doc integer);
+create virtual table if not exists docs using fts5(title, statement, samples, source,
+    kind unindexed, contest unindexed, problem unindexed, path unindexed, tokenize = 'unicode61 remove_diacritics 2');
+'''
+weights = (10.0, 1.0, 0.5, 1.0)  # bm25 weights of title, statement, samples, source
+
+
+def fts_query(query):
+    # all words must be present, words are matched as prefixes ("масс" finds "массива"), FTS syntax isn't needed
+    words = re.findall(r'[^\W_]+', query)
+    return ' '.join(f'"{w}"*' for w in words)
+
+
+def _statement_doc(text):
+    sections = text.split(section_delim)
+    samples = [s for s in sections[1:] if s.startswith(sample_marker)]
+    statement = [s for s in sections[1:] if not s.startswith(sample_marker)]
+    return sections[0], '\n'.join(statement), '\n'.join(samples), ''
+
+
+def _source_doc(data):
+    if b'\0' in data:  # binary
+        return None
+    return '', '', '', data.decode(errors='replace')
+
+
+def _statement_ids(dirname):
+    # problem ids of statements loaded by "load", None if there is no manifest
+    try:
+        with open(os.path.join(dirname, '.manifest.json')) as f:
+            return set(json.load(f))
+    except (OSError, ValueError):
+        return None
+
+
+class SearchIndex():
+    # full-text index of downloaded statements and solutions
+    def __init__(self, path=None):
+        if path is None:
+            os.makedirs(data_dir(), exist_ok=True)
+            path = os.path.join(data_dir(), 'search.sqlite')
+        self.db = sqlite3.connect(path)
+        try:
+            self.db.executescript(schema)
+        except sqlite3.OperationalError as e:
+            self.db.close()
+            raise YacontestError(f'Search is not available: {e} (SQLite must be built with FTS5)') from None
+
+    def close(self):
+        self.db.close()
+
+    def add_root(self, path, kind, contest=None):
+        # contest: id of the contest for "problems", contests of solutions are their directory names
+        with self.db:
+            if contest is None:
+                self.db.execute('insert or ignore into roots values (?, ?, null)', (os.path.abspath(path), kind))
+            else:
+                self.db.execute('insert or replace into roots values (?, ?, ?)', (os.path.abspath(path), kind, contest))
+
+    def _scan(self, root, kind, contest):
+        # yields (path, contest, problem, stat) of files which are indexed
+        if kind == 'problems':
+            dirs = [(root, contest)]
+        else:
+            dirs = [(e.path, int(e.name)) for e in os.scandir(root) if e.is_dir() and e.name.isnumeric()]
+        for dirname, cid in dirs:
+            pids = _statement_ids(dirname) if kind == 'problems' else None
+            for e in os.scandir(dirname):
+                if e.name.startswith('.') or not e.is_file():
+                    continue
+                stem, ext = os.path.splitext(e.name)
+                # other text files are e.g. failing tests of "stress" (<pid>.fail.txt)
+                if kind == 'problems' and (ext != '.txt' or (stem not in pids if pids is not None else '.' in stem)):
+                    continue
+                st = e.stat()
+                if kind == 'solutions' and st.st_size > max_source_size:
+                    continue
+                yield e.path, cid, stem, st
+
+    def _document(self, path, kind):
+        # (title, statement, samples, source) or None if the file can't be indexed
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        if kind == 'problems':
+            return _statement_doc(data.decode(errors='replace'))
+        return _source_doc(data)
+
+    def update(self):
+        # indexes new and changed files, forgets removed ones, returns the number of indexed files
+        indexed = 0
+        with self.db:
+            for root, kind, contest in self.db.execute('select path, kind, contest from roots').fetchall():
+                known = {path: (mtime, size, doc) for path, mtime, size, doc in
+                         self.db.execute('select path, mtime, size, doc from files where root = ?', (root,))}
+                found = set()
+                if os.path.isdir(root):
+                    for path, cid, problem, st in self._scan(root, kind, contest):
+                        found.add(path)
+                        old = known.get(path)
+                        if old is not None and old[:2] == (st.st_mtime_ns, st.st_size):
+                            continue
+                        if old is not None:
+                            self.db.execute('delete from docs where rowid = ?', (old[2],))
+                        doc = self._document(path, kind)
+                        doc_id = None
+                        if doc is not None:
+                            doc_id = self.db.execute('insert into docs values (?, ?, ?, ?, ?, ?, ?, ?)',
+                                                     (*doc, 'statement' if kind == 'problems' else 'solution',
+                                                      cid, problem, path)).lastrowid
+                            indexed += 1
+                        self.db.execute('insert or replace into files values (?, ?, ?, ?, ?)',
+                                        (path, root, st.st_mtime_ns, st.st_size, doc_id))
+                else:
+                    self.db.execute('delete from roots where path = ?', (root,))
+                for path in set(known) - found:
+                    self.db.execute('delete from docs where rowid = ?', (known[path][2],))
+                    self.db.execute('delete from files where path = ?', (path,))
+        return indexed
+
+    def search(self, query, kind=None, limit=20):
+        # returns [(kind, contest, problem, path, snippet)], best matches first
+        # kind: "statement" / "solution" / None (both)
+        match = fts_query(query)
+        if not match:
+            return []
+        sql = ("select kind, contest, problem, path, snippet(docs, -1, '[', ']', '...', 10) from docs "
+               'where docs match ?' + (' and kind = ?' if kind is not None else '') +
+               ' order by bm25(docs, ?, ?, ?, ?) limit ?')
+        params = [match] + ([kind] if kind is not None else []) + list(weights) + [limit]
+        return self.db.execute(sql, params).fetchall()
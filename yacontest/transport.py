@@ -0,0 +1,162 @@
+import os
+import random
+import threading
+from time import perf_counter, sleep
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from . import profiling
+from .profiling import span, url_class
+from .utils import YacontestError
+
+
+def _setting(name, default, convert=float):
+    # a transport setting from the environment, e.g. YACONTEST_RATE=5
+    value = os.environ.get(name)
+    if not value:
+        return default
+    try:
+        return convert(value)
+    except ValueError:
+        raise YacontestError(f'Invalid value of {name}: {value}') from None
+
+
+def _timeout(value):
+    # "5" -> 5 seconds for connect and read, "5,30" -> (5, 30)
+    parts = [float(e) for e in value.split(',')]
+    if len(parts) > 2:
+        raise ValueError(value)
+    return tuple(parts) if len(parts) == 2 else parts[0]
+
+
+class TokenBucket():
+    # allows rate requests per second on average with bursts of up to burst requests
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = perf_counter()
+        self.lock = threading.Lock()
+
+    def reserve(self):
+        # takes a token, returns the time to wait before using it
+        with self.lock:
+            now = perf_counter()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1  # may become negative: the token is reserved, concurrent callers wait in turn
+            return -self.tokens / self.rate if self.tokens < 0 else 0
+
+
+class Session(requests.Session):
+    # requests.Session with timeouts, per-host rate limiting and jittered retries of idempotent requests
+    # on 5xx responses and connection errors. Also records a span for each request if profiling is enabled
+    # Settings can be changed by environment variables, see README
+    idempotent = {'GET', 'HEAD', 'OPTIONS'}
+    retry_statuses = {429, 500, 502, 503, 504}
+    backoff = 0.5  # seconds, the maximal delay before a retry is doubled after each attempt
+    max_backoff = 8
+
+    def __init__(self):
+        super().__init__()
+        self.rate = _setting('YACONTEST_RATE', 20)  # requests per second for each host, 0: unlimited
+        self.burst = _setting('YACONTEST_BURST', 2 * self.rate)
+        self.retries = _setting('YACONTEST_RETRIES', 3, int)
+        self.timeout = _setting('YACONTEST_TIMEOUT', (10, 30), _timeout)  # seconds, (connect, read)
+        self.pool_size = 0
+        self.set_pool_size(_setting('YACONTEST_POOL_SIZE', 10, int))
+        self.buckets = {}  # {host: TokenBucket}
+        # requests: sent requests (including retries and redirects), rate_wait / retry_wait: seconds spent waiting
+        self.metrics = {'requests': 0, 'retries': 0, 'rate_wait': 0.0, 'retry_wait': 0.0}
+        self._lock = threading.Lock()
+        self.uploaded = False  # set by the client after sending a solution, a command can't be repeated after it
+
+    def set_pool_size(self, size):
+        # maximal number of kept connections for each host. Growing the pool replaces the adapters, so their open
+        # connections are closed; it's never shrunk, so a warm pool (e.g. in the daemon) is kept for smaller sizes
+        if size <= self.pool_size:
+            return
+        self.pool_size = size
+        for prefix in ('http://', 'https://'):
+            old = self.adapters.get(prefix)
+            self.mount(prefix, HTTPAdapter(pool_maxsize=size, max_retries=0))
+            if old is not None:
+                old.close()
+
+    def _count(self, name, value=1):
+        with self._lock:
+            self.metrics[name] += value
+
+    def _rate_limit(self, url):
+        if not self.rate:
+            return
+        host = urlparse(url).netloc
+        with self._lock:
+            bucket = self.buckets.get(host)
+            if bucket is None:
+                bucket = self.buckets[host] = TokenBucket(self.rate, max(1, self.burst))
+        wait = bucket.reserve()
+        if wait > 0:
+            with span('wait', 'rate limit'):
+                sleep(wait)
+            self._count('rate_wait', wait)
+
+    def _retry_delay(self, attempt, r=None):
+        # full jitter, so concurrent clients don't retry at the same moment; Retry-After is respected
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+        retry_after = r.headers.get('Retry-After', '') if r is not None else ''
+        if retry_after.isdigit():
+            delay = max(delay, min(int(retry_after), 60))
+        return delay
+
+    def send(self, request, **kwargs):
+        # called for each request and each redirect
+        attempt = 0
+        while True:
+            self._rate_limit(request.url)
+            self._count('requests')
+            try:
+                r = super().send(request, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                # a POST is repeated only if the connection wasn't established, otherwise it may be processed twice
+                if attempt >= self.retries or (request.method not in self.idempotent and not isinstance(e, requests.ConnectTimeout)):
+                    raise
+                r = None
+            else:
+                if r.status_code not in self.retry_statuses or request.method not in self.idempotent or attempt >= self.retries:
+                    return r
+            delay = self._retry_delay(attempt, r)
+            if r is not None:
+                r.close()
+            with span('wait', 'retry', status=r.status_code if r is not None else None):
+                sleep(delay)
+            self._count('retries')
+            self._count('retry_wait', delay)
+            attempt += 1
+
+    def _connections(self):
+        count = 0
+        for adapter in self.adapters.values():
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                try:
+                    count += pools[key].num_connections
+                except KeyError:  # evicted by another thread
+                    pass
+        return count
+
+    def request(self, method, url, *args, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        if profiling.spans is None:
+            return super().request(method, url, *args, **kwargs)
+        params = kwargs.get('params')
+        connections = self._connections()  # NOTE not exact if there are concurrent requests
+        retries = self.metrics['retries']  # same
+        with span('http', method + ' ' + url_class(url + ('?' + '&'.join(params) if params else ''))) as s:
+            r = super().request(method, url, *args, **kwargs)
+            s.set(status=r.status_code, bytes=0 if kwargs.get('stream') else len(r.content), redirects=len(r.history),
+                  new_connections=self._connections() - connections, retries=self.metrics['retries'] - retries)
+        return r
@@ -1,7 +1,26 @@
 import os
 import shutil
+import threading
 
 
+class YacontestError(Exception):
+    # an error which should be shown to the user
+    pass
+
+def cache_dir():
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'yacontest')
+
+def config_dir():
+    if os.environ.get('YACONTEST_CONFIG_DIR'):
+        return os.environ['YACONTEST_CONFIG_DIR']
+    base = os.environ.get('XDG_CONFIG_HOME') or os.path.join(os.path.expanduser('~'), '.config')
+    return os.path.join(base, 'yacontest')
+
+def data_dir():
+    base = os.environ.get('XDG_DATA_HOME') or os.path.join(os.path.expanduser('~'), '.local', 'share')
+    return os.path.join(base, 'yacontest')
+
 def clean_dir(dirname):
     for root, dirs, files in os.walk(dirname):
         for f in files:
@@ -9,6 +28,31 @@ def clean_dir(dirname):
         for d in dirs:
             shutil.rmtree(os.path.join(root, d))
 
+def write_atomic(path, data, mode=0o666):
+    # readers never see a partially written file, mode is restricted by umask
+    dirname, name = os.path.split(path)
+    tmp = os.path.join(dirname, f'.{name}.{os.getpid()}.{threading.get_ident()}.tmp')
+    try:
+        with open(os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, mode), 'wb') as f:  # not mkstemp, it ignores umask
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+
+def format_table(rows):
+    cell_sizes = [max(map(len, col)) for col in zip(*rows)]
+    fmtstr = '  '.join(['{{:{}s}}'.format(sz) for sz in cell_sizes])
+    return [fmtstr.format(*row) for row in rows]
+
+def head(text, lines=20):
+    # first lines of a text, for long inputs / outputs
+    text = text.rstrip('\n').split('\n')
+    return '\n'.join(text[:lines] + (['...'] if len(text) > lines else []))
+
 def choice(prompt, variants, default=None):
     def get_number():
         ans = input()
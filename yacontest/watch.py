@@ -0,0 +1,103 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+from time import sleep, time
+
+# inotify events, see inotify(7). The directory is watched, because editors often replace the file with a new one
+IN_MODIFY = 0x2
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+event_header = struct.Struct('iIII')  # wd, mask, cookie, len
+
+
+def _inotify(dirname):
+    # returns an inotify descriptor watching the directory or None if inotify is unavailable
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+    except (OSError, AttributeError):
+        return None
+    if fd < 0:
+        return None
+    mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+    if libc.inotify_add_watch(fd, os.fsencode(dirname), mask) < 0:
+        os.close(fd)
+        return None
+    return fd
+
+
+class FileWatcher():
+    # with FileWatcher(path) as w: w.wait(timeout) -> True if the file may have changed
+    poll_interval = 0.2  # used if inotify is unavailable
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        self.name = os.fsencode(os.path.basename(self.path))
+        self.fd = None if os.environ.get('YACONTEST_NO_INOTIFY') else _inotify(os.path.dirname(self.path))
+        self.signature = self._signature()
+
+    def _signature(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return st.st_ino, st.st_size, st.st_mtime_ns
+
+    def _read_events(self):
+        data = os.read(self.fd, 65536)
+        changed = False
+        pos = 0
+        while pos < len(data):
+            _, _, _, size = event_header.unpack_from(data, pos)
+            pos += event_header.size
+            name = data[pos:pos + size].rstrip(b'\0')
+            pos += size
+            changed = changed or name == self.name
+        return changed
+
+    def _wait_inotify(self, deadline):
+        while True:
+            timeout = None if deadline is None else max(0, deadline - time())
+            if not select.select([self.fd], [], [], timeout)[0]:
+                return False
+            try:
+                if self._read_events():
+                    return True
+            except BlockingIOError:
+                pass
+
+    def _wait_polling(self, deadline):
+        while True:
+            signature = self._signature()
+            if signature != self.signature:
+                self.signature = signature
+                return True
+            if deadline is not None and time() >= deadline:
+                return False
+            sleep(self.poll_interval if deadline is None else max(0, min(self.poll_interval, deadline - time())))
+
+    def wait(self, timeout=None):
+        # timeout=None: until the file changes
+        deadline = None if timeout is None else time() + timeout
+        if self.fd is not None:
+            return self._wait_inotify(deadline)
+        return self._wait_polling(deadline)
+
+    def settle(self, delay):
+        # waits until the file hasn't changed for delay seconds (editors may write a file in several steps)
+        while self.wait(delay):
+            pass
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()